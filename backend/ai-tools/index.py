@@ -6,16 +6,42 @@ Returns: HTTP response based on action type
 
 import json
 import os
-from typing import Dict, Any, List, Optional
-import base64
-import urllib.request
-import urllib.parse
-import html
-import re
-import time
-from collections import defaultdict
+from typing import Dict, Any, List
 
-request_counts = defaultdict(list)
+from shared.db_proxy import BATCH_OUTCOME_INSERTED, insert_many, run_query
+from shared.fast_json import dumps
+from shared.rate_limit import check_rate_limit, configure as configure_rate_limit
+from shared.security import compile_schema, extract_ip, safe_error_response, sanitize_input, sanitize_many, validate_input
+
+MAX_KNOWLEDGE_ENTRIES = 1000
+AUTO_LEARN_TIMEOUT = 30
+
+configure_rate_limit(lambda query, params: run_query(os.environ.get('DATABASE_URL', ''), query, params))
+
+ACTION_SCHEMA = compile_schema({
+    'action': {'type': str, 'required': True, 'max_len': 50}
+})
+
+AUTO_LEARN_SCHEMA = compile_schema({
+    'bot_id': {'type': int, 'required': True, 'min': 1},
+    'lookback_days': {'type': int, 'min': 1, 'max': 3650},
+    'min_frequency': {'type': int, 'min': 1, 'max': 100000},
+    'limit': {'type': int, 'min': 1, 'max': 10000}
+})
+
+CRM_SYNC_SCHEMA = compile_schema({
+    'api_key': {'type': str, 'required': True, 'min_len': 10, 'max_len': 200},
+    'subdomain': {'type': str, 'required': True, 'pattern': r'^[a-z0-9-]+$', 'max_len': 100}
+})
+
+OCR_SCHEMA = compile_schema({
+    'image_url': {'type': str, 'required': True, 'max_len': 2000}
+})
+
+KNOWLEDGE_UPDATE_SCHEMA = compile_schema({
+    'bot_id': {'type': int, 'required': True, 'min': 1},
+    'entries': {'type': list, 'required': True}
+})
 
 def get_cors_headers(event):
     return {
@@ -26,159 +52,94 @@ def get_cors_headers(event):
         'Content-Type': 'application/json'
     }
 
-def check_rate_limit(ip, limit=30, window=60):
-    now = time.time()
-    request_counts[ip] = [t for t in request_counts[ip] if now - t < window]
-    if len(request_counts[ip]) >= limit:
-        return False
-    request_counts[ip].append(now)
-    return True
-
-def sanitize_input(text, max_len=1000):
-    if not text:
-        return ''
-    text = str(text)[:max_len]
-    text = re.sub(r'<[^>]*>', '', text)
-    text = html.escape(text)
-    return text.strip()
-
-def validate_input(data, schema):
-    errors = []
-    for field, rules in schema.items():
-        value = data.get(field)
-        if rules.get('required') and not value:
-            errors.append(f'{field} is required')
-            continue
-        if value is not None:
-            if rules.get('type') and not isinstance(value, rules['type']):
-                errors.append(f'{field} must be {rules["type"].__name__}')
-                continue
-            if isinstance(value, str):
-                if 'max_len' in rules and len(value) > rules['max_len']:
-                    errors.append(f'{field} exceeds max length')
-                if 'min_len' in rules and len(value) < rules['min_len']:
-                    errors.append(f'{field} is too short')
-                if 'pattern' in rules and not re.match(rules['pattern'], value):
-                    errors.append(f'{field} format invalid')
-            if isinstance(value, int):
-                if 'min' in rules and value < rules['min']:
-                    errors.append(f'{field} too small')
-    return errors
-
-def extract_ip(event):
-    return event.get('requestContext', {}).get('identity', {}).get('sourceIp', 'unknown')
-
-def safe_error_response(error, context):
-    return {
-        'statusCode': 500,
-        'headers': {'Content-Type': 'application/json'},
-        'body': json.dumps({'error': 'Internal server error'})
-    }
 
-
-def get_db_connection_params(db_url: str) -> Dict[str, Any]:
-    """Parse DATABASE_URL"""
-    if db_url.startswith('postgresql://'):
-        db_url = db_url.replace('postgresql://', '')
-    
-    parts = db_url.split('@')
-    user_pass = parts[0].split(':')
-    host_db = parts[1].split('/')
-    host_port = host_db[0].split(':')
+def auto_learn(bot_id: int, db_url: str, lookback_days: int = 7, min_frequency: int = 2, limit: int = 20) -> Dict:
+    """
+    Auto-learning from conversations: frequent question/answer pairs from the
+    lookback window are selected, de-duplicated and inserted by one statement
+    """
+    rows = run_query(
+        db_url,
+        """
+        WITH candidates AS (
+            SELECT m.message_text AS question, m.response_text AS answer, COUNT(*) AS frequency
+            FROM messages m
+            WHERE m.bot_id = %s
+            AND m.response_text IS NOT NULL
+            AND m.created_at > NOW() - make_interval(days => %s)
+            GROUP BY m.message_text, m.response_text
+            HAVING COUNT(*) >= %s
+            ORDER BY frequency DESC
+            LIMIT %s
+        ),
+        fresh AS (
+            SELECT DISTINCT ON (c.question) c.question, c.answer
+            FROM candidates c
+            WHERE length(c.question) > 3 AND length(c.answer) > 3
+            AND NOT EXISTS (
+                SELECT 1 FROM bot_training_data t
+                WHERE t.bot_id = %s AND md5(t.question) = md5(c.question) AND t.question = c.question
+            )
+            ORDER BY c.question, c.frequency DESC
+        ),
+        inserted AS (
+            INSERT INTO bot_training_data (bot_id, question, answer, category)
+            SELECT %s, question, answer, 'auto_learned' FROM fresh
+            RETURNING id
+        )
+        SELECT (SELECT COUNT(*) FROM candidates) AS candidates, (SELECT COUNT(*) FROM inserted) AS learned
+        """,
+        (bot_id, lookback_days, min_frequency, limit, bot_id, bot_id),
+        timeout=AUTO_LEARN_TIMEOUT
+    )
     
+    counts = rows[0] if rows else {}
     return {
-        'user': user_pass[0],
-        'password': user_pass[1] if len(user_pass) > 1 else '',
-        'host': host_port[0],
-        'port': int(host_port[1]) if len(host_port) > 1 else 5432,
-        'database': host_db[1].split('?')[0] if len(host_db) > 1 else 'postgres'
+        'learned': int(counts.get('learned') or 0),
+        'candidates': int(counts.get('candidates') or 0)
     }
 
 
-def execute_query(db_url: str, query: str, params: tuple = ()) -> List[Dict]:
-    """Execute SQL query"""
-    conn_params = get_db_connection_params(db_url)
-    
-    formatted_query = query
-    if params:
-        formatted_params = []
-        for param in params:
-            if param is None:
-                formatted_params.append('NULL')
-            elif isinstance(param, str):
-                formatted_params.append(f"'{param.replace(chr(39), chr(39)+chr(39))}'")
-            elif isinstance(param, bool):
-                formatted_params.append('TRUE' if param else 'FALSE')
-            else:
-                formatted_params.append(str(param))
-        
-        formatted_query = query.replace('%s', '{}')
-        for formatted_param in formatted_params:
-            formatted_query = formatted_query.replace('{}', formatted_param, 1)
-    
-    proxy_url = f"http://goauth-proxy:5432/{conn_params['database']}"
-    
-    data = json.dumps({'query': formatted_query}).encode('utf-8')
+def knowledge_update(bot_id: int, entries: List[Any], db_url: str) -> Dict:
+    """Bulk knowledge import: one statement inserts all valid entries and logs the update"""
+    rows = []
+    positions = []
+    results = ['invalid'] * len(entries)
+    candidates = [(position, entry) for position, entry in enumerate(entries) if isinstance(entry, dict)]
+    questions = sanitize_many([entry.get('question', '') for _, entry in candidates], 1000)
+    answers = sanitize_many([entry.get('answer', '') for _, entry in candidates], 5000)
+    categories = sanitize_many([entry.get('category', 'manual') for _, entry in candidates], 50)
     
-    req = urllib.request.Request(
-        proxy_url,
-        data=data,
-        headers={
-            'Content-Type': 'application/json',
-            'X-DB-User': conn_params['user'],
-            'X-DB-Password': conn_params['password'],
-            'X-DB-Host': conn_params['host'],
-            'X-DB-Port': str(conn_params['port'])
-        }
-    )
+    for (position, _), question, answer, category in zip(candidates, questions, answers, categories):
+        if question and answer and len(question) > 3 and len(answer) > 3:
+            rows.append((bot_id, question, answer, category))
+            positions.append(position)
     
-    try:
-        with urllib.request.urlopen(req, timeout=5) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            return result.get('rows', [])
-    except Exception:
-        return []
-
-
-def auto_learn(bot_id: int, db_url: str) -> Dict:
-    """Auto-learning from conversations"""
-    messages = execute_query(
-        db_url,
-        """
-        SELECT m.message_text, m.response_text, COUNT(*) as frequency
-        FROM messages m
-        WHERE m.bot_id = %s 
-        AND m.response_text IS NOT NULL
-        AND m.created_at > NOW() - INTERVAL '7 days'
-        GROUP BY m.message_text, m.response_text
-        HAVING COUNT(*) >= 2
-        ORDER BY frequency DESC
-        LIMIT 20
-        """,
-        (bot_id,)
+    log_query = (
+        "logged AS (INSERT INTO knowledge_updates (bot_id, update_type, source, entries_added) "
+        "SELECT %s, %s, %s, COUNT(*) FROM inserted)"
     )
+    log_params = (bot_id, 'bulk_update', 'api')
     
-    learned_count = 0
-    for msg in messages:
-        question = msg.get('message_text', '')
-        answer = msg.get('response_text', '')
-        
-        if question and answer and len(question) > 3 and len(answer) > 3:
-            existing = execute_query(
-                db_url,
-                "SELECT id FROM bot_training_data WHERE bot_id = %s AND question = %s LIMIT 1",
-                (bot_id, question)
-            )
-            
-            if not existing:
-                execute_query(
-                    db_url,
-                    "INSERT INTO bot_training_data (bot_id, question, answer, category) VALUES (%s, %s, %s, %s)",
-                    (bot_id, question, answer, 'auto_learned')
-                )
-                learned_count += 1
+    if rows:
+        outcomes = insert_many(
+            db_url,
+            'bot_training_data',
+            ('bot_id', 'question', 'answer', 'category'),
+            rows,
+            also=log_query,
+            also_params=log_params
+        )
+        for position, outcome in zip(positions, outcomes):
+            results[position] = 'added' if outcome == BATCH_OUTCOME_INSERTED else 'failed'
+    else:
+        run_query(
+            db_url,
+            "INSERT INTO knowledge_updates (bot_id, update_type, source, entries_added) VALUES (%s, %s, %s, %s)",
+            log_params + (0,)
+        )
     
-    return {'learned': learned_count}
+    return {'added': results.count('added'), 'results': results}
 
 
 def sync_crm_amocrm(api_key: str, subdomain: str, contact: Dict) -> Dict:
@@ -193,6 +154,8 @@ def sync_crm_amocrm(api_key: str, subdomain: str, contact: Dict) -> Dict:
         ]
     }]
     
+    import urllib.request
+    
     try:
         req = urllib.request.Request(
             url,
@@ -212,6 +175,9 @@ def sync_crm_amocrm(api_key: str, subdomain: str, contact: Dict) -> Dict:
 
 def ocr_image(image_url: str) -> str:
     """OCR using OCR.space free API"""
+    import urllib.parse
+    import urllib.request
+    
     try:
         api_url = 'https://api.ocr.space/parse/imageurl'
         
@@ -254,28 +220,26 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         return {
             'statusCode': 405,
             'headers': cors_headers,
-            'body': json.dumps({'error': 'Method not allowed'})
+            'body': dumps({'error': 'Method not allowed'})
         }
     
     ip_address = extract_ip(event)
-    if not check_rate_limit(ip_address, limit=30, window=60):
+    if not check_rate_limit(f'ai-tools:{ip_address}', limit=30, window=60):
         return {
             'statusCode': 429,
             'headers': cors_headers,
-            'body': json.dumps({'error': 'Too many requests'})
+            'body': dumps({'error': 'Too many requests'})
         }
     
     try:
         body_data = json.loads(event.get('body', '{}'))
         
-        errors = validate_input(body_data, {
-            'action': {'type': str, 'required': True, 'max_len': 50}
-        })
+        errors = validate_input(body_data, ACTION_SCHEMA)
         if errors:
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'errors': errors})
+                'body': dumps({'errors': errors})
             }
         
         action: str = body_data.get('action', '')
@@ -283,36 +247,37 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         db_url = os.environ.get('DATABASE_URL')
         
         if action == 'auto_learn':
-            errors = validate_input(body_data, {
-                'bot_id': {'type': int, 'required': True, 'min': 1}
-            })
+            errors = validate_input(body_data, AUTO_LEARN_SCHEMA)
             if errors:
-                return {'statusCode': 400, 'headers': cors_headers, 'body': json.dumps({'errors': errors})}
+                return {'statusCode': 400, 'headers': cors_headers, 'body': dumps({'errors': errors})}
             
             bot_id: int = body_data.get('bot_id')
             if not db_url:
                 return {
                     'statusCode': 500,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'DATABASE_URL not configured'})
+                    'body': dumps({'error': 'DATABASE_URL not configured'})
                 }
             
-            result = auto_learn(bot_id, db_url)
+            result = auto_learn(
+                bot_id,
+                db_url,
+                lookback_days=body_data.get('lookback_days', 7),
+                min_frequency=body_data.get('min_frequency', 2),
+                limit=body_data.get('limit', 20)
+            )
             
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
                 'isBase64Encoded': False,
-                'body': json.dumps({'success': True, 'result': result})
+                'body': dumps({'success': True, 'result': result})
             }
         
         elif action == 'crm_sync':
-            errors = validate_input(body_data, {
-                'api_key': {'type': str, 'required': True, 'min_len': 10, 'max_len': 200},
-                'subdomain': {'type': str, 'required': True, 'pattern': r'^[a-z0-9-]+$', 'max_len': 100}
-            })
+            errors = validate_input(body_data, CRM_SYNC_SCHEMA)
             if errors:
-                return {'statusCode': 400, 'headers': cors_headers, 'body': json.dumps({'errors': errors})}
+                return {'statusCode': 400, 'headers': cors_headers, 'body': dumps({'errors': errors})}
             
             api_key = sanitize_input(body_data.get('api_key', ''), 200)
             subdomain = sanitize_input(body_data.get('subdomain', ''), 100)
@@ -324,15 +289,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'statusCode': 200,
                 'headers': cors_headers,
                 'isBase64Encoded': False,
-                'body': json.dumps({'success': True, 'result': result})
+                'body': dumps({'success': True, 'result': result})
             }
         
         elif action == 'ocr':
-            errors = validate_input(body_data, {
-                'image_url': {'type': str, 'required': True, 'max_len': 2000}
-            })
+            errors = validate_input(body_data, OCR_SCHEMA)
             if errors:
-                return {'statusCode': 400, 'headers': cors_headers, 'body': json.dumps({'errors': errors})}
+                return {'statusCode': 400, 'headers': cors_headers, 'body': dumps({'errors': errors})}
             
             image_url = sanitize_input(body_data.get('image_url', ''), 2000)
             text = ocr_image(image_url)
@@ -341,66 +304,45 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'statusCode': 200,
                 'headers': cors_headers,
                 'isBase64Encoded': False,
-                'body': json.dumps({'success': True, 'text': sanitize_input(text, 10000)})
+                'body': dumps({'success': True, 'text': sanitize_input(text, 10000)})
             }
         
         elif action == 'knowledge_update':
-            errors = validate_input(body_data, {
-                'bot_id': {'type': int, 'required': True, 'min': 1},
-                'entries': {'type': list, 'required': True}
-            })
+            errors = validate_input(body_data, KNOWLEDGE_UPDATE_SCHEMA)
             if errors:
-                return {'statusCode': 400, 'headers': cors_headers, 'body': json.dumps({'errors': errors})}
+                return {'statusCode': 400, 'headers': cors_headers, 'body': dumps({'errors': errors})}
             
             bot_id: int = body_data.get('bot_id')
             entries: List[Dict] = body_data.get('entries', [])
             
-            if len(entries) > 100:
+            if len(entries) > MAX_KNOWLEDGE_ENTRIES:
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'Maximum 100 entries per request'})
+                    'body': dumps({'error': f'Maximum {MAX_KNOWLEDGE_ENTRIES} entries per request'})
                 }
             
             if not db_url:
                 return {
                     'statusCode': 500,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'DATABASE_URL not configured'})
+                    'body': dumps({'error': 'DATABASE_URL not configured'})
                 }
             
-            added = 0
-            for entry in entries:
-                question = sanitize_input(entry.get('question', ''), 1000)
-                answer = sanitize_input(entry.get('answer', ''), 5000)
-                category = sanitize_input(entry.get('category', 'manual'), 50)
-                
-                if question and answer and len(question) > 3 and len(answer) > 3:
-                    execute_query(
-                        db_url,
-                        "INSERT INTO bot_training_data (bot_id, question, answer, category) VALUES (%s, %s, %s, %s)",
-                        (bot_id, question, answer, category)
-                    )
-                    added += 1
-            
-            execute_query(
-                db_url,
-                "INSERT INTO knowledge_updates (bot_id, update_type, source, entries_added) VALUES (%s, %s, %s, %s)",
-                (bot_id, 'bulk_update', 'api', added)
-            )
+            result = knowledge_update(bot_id, entries, db_url)
             
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
                 'isBase64Encoded': False,
-                'body': json.dumps({'success': True, 'added': added})
+                'body': dumps({'success': True, 'added': result['added'], 'results': result['results']})
             }
         
         else:
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Invalid action'})
+                'body': dumps({'error': 'Invalid action'})
             }
     
     except Exception as e:
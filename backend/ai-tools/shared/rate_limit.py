@@ -0,0 +1,161 @@
+# Vendored from backend/shared/rate_limit.py by backend/shared/vendor.py - do not edit
+"""
+Rate limiting по алгоритму GCRA
+На ключ хранится одно число - теоретическое время прибытия (TAT) следующего
+запроса, поэтому проверка O(1) и по памяти, и по времени. Хранилище
+подключаемое: локальное LRU в контейнере или общая таблица в Postgres,
+чтобы лимит действовал на все экземпляры функции
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+MAX_LOCAL_KEYS = 10000
+CLEANUP_EVERY = 1000
+STALE_AFTER_SECONDS = 3600
+
+Execute = Callable[[str, tuple], List[Dict[str, Any]]]
+
+
+class LocalStore:
+    """
+    TAT ключей в памяти контейнера с вытеснением давно неактивных (LRU)
+
+    Args:
+        max_keys: Сколько ключей держать
+    """
+
+    def __init__(self, max_keys: int = MAX_LOCAL_KEYS) -> None:
+        self.max_keys = max_keys
+        self._tat: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, interval: float, window: float) -> bool:
+        """
+        Пропустить запрос, если он укладывается в лимит, и сдвинуть TAT
+
+        Args:
+            key: Ключ лимита
+            interval: Интервал между запросами в равномерном потоке (window / limit)
+            window: Окно в секундах, за которое допускается limit запросов подряд
+
+        Returns:
+            True если запрос разрешён
+        """
+        now = time.monotonic()
+        with self._lock:
+            tat = max(self._tat.get(key, now), now) + interval
+            if tat - now > window:
+                return False
+            self._tat[key] = tat
+            self._tat.move_to_end(key)
+            if len(self._tat) > self.max_keys:
+                self._tat.popitem(last=False)
+            return True
+
+
+class PostgresStore:
+    """
+    TAT ключей в таблице rate_limits, общий для всех контейнеров
+
+    Проверка и сдвиг TAT делаются одним UPSERT по часам сервера БД.
+    При недоступности БД проверка уходит в локальное хранилище.
+
+    Args:
+        execute: Выполняет SQL с плейсхолдерами %s и возвращает строки
+        fallback: Хранилище на случай ошибки БД
+    """
+
+    def __init__(self, execute: Execute, fallback: Optional[LocalStore] = None) -> None:
+        self.execute = execute
+        self.fallback = fallback or LocalStore()
+        self._calls = 0
+
+    def acquire(self, key: str, interval: float, window: float) -> bool:
+        self._calls += 1
+        try:
+            if self._calls % CLEANUP_EVERY == 0:
+                self.execute(
+                    "DELETE FROM rate_limits WHERE tat < EXTRACT(EPOCH FROM clock_timestamp()) - %s RETURNING key",
+                    (STALE_AFTER_SECONDS,)
+                )
+            rows = self.execute(
+                """
+                INSERT INTO rate_limits AS r (key, tat)
+                VALUES (%s, EXTRACT(EPOCH FROM clock_timestamp()) + %s)
+                ON CONFLICT (key) DO UPDATE
+                SET tat = GREATEST(r.tat, EXCLUDED.tat - %s) + %s
+                WHERE GREATEST(r.tat, EXCLUDED.tat - %s) + %s <= EXCLUDED.tat - %s + %s
+                RETURNING tat
+                """,
+                (key, interval, interval, interval, interval, interval, interval, window)
+            )
+        except Exception:
+            return self.fallback.acquire(key, interval, window)
+        return bool(rows)
+
+
+class RateLimiter:
+    """
+    Проверка лимитов поверх хранилища
+
+    Args:
+        store: LocalStore, PostgresStore или любой объект с acquire(key, interval, window)
+    """
+
+    def __init__(self, store: Any = None) -> None:
+        self.store = store or LocalStore()
+
+    def allow(self, key: str, limit: int, window: float) -> bool:
+        """
+        Не больше limit запросов за window секунд по ключу
+
+        Args:
+            key: Ключ лимита, например 'bots-api:<ip>'
+            limit: Максимум запросов в окне
+            window: Окно времени в секундах
+
+        Returns:
+            True если лимит не превышен
+        """
+        return self.store.acquire(f'{key}:{limit}/{window}', window / limit, window)
+
+
+_limiter = RateLimiter()
+
+
+def configure(execute: Optional[Execute] = None) -> RateLimiter:
+    """
+    Выбор хранилища по RATE_LIMIT_BACKEND: 'local' (по умолчанию) или
+    'postgres' - тогда нужен execute для доступа к БД
+
+    Args:
+        execute: Выполняет SQL с плейсхолдерами %s и возвращает строки
+
+    Returns:
+        Лимитер, которым пользуется check_rate_limit
+    """
+    global _limiter
+    if os.environ.get('RATE_LIMIT_BACKEND', 'local') == 'postgres' and execute is not None:
+        _limiter = RateLimiter(PostgresStore(execute))
+    else:
+        _limiter = RateLimiter()
+    return _limiter
+
+
+def check_rate_limit(key: str, limit: int = 60, window: int = 60) -> bool:
+    """
+    Проверка rate limiting по ключу (обычно IP адресу)
+
+    Args:
+        key: Ключ лимита
+        limit: Максимум запросов в окне
+        window: Окно времени в секундах
+
+    Returns:
+        True если лимит не превышен, False иначе
+    """
+    return _limiter.allow(key, limit, window)
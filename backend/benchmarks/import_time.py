@@ -0,0 +1,78 @@
+"""
+Benchmark: cold-start import time of every function and its vendored shared modules.
+
+Usage: python backend/benchmarks/import_time.py [--runs N] [--max-ms MS]
+Each run imports index in a fresh interpreter with -X importtime from the
+function directory, the way the platform loads it. Medians are reported;
+with --max-ms the script exits with 1 if any function is slower, so it
+can guard cold starts in CI as the shared package grows.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def function_dirs() -> List[str]:
+    return sorted(
+        name for name in os.listdir(BACKEND_DIR)
+        if os.path.isfile(os.path.join(BACKEND_DIR, name, 'index.py'))
+    )
+
+
+def import_profile(function: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds of index and each shared module"""
+    env = {key: value for key, value in os.environ.items() if key != 'DATABASE_URL'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import index'],
+        cwd=os.path.join(BACKEND_DIR, function),
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'{function}: import failed\n{result.stderr.strip().splitlines()[-1]}')
+
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        if name == 'index' or name.startswith('shared.'):
+            profile[name] = int(cumulative)
+    return profile
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    runs = int(args[args.index('--runs') + 1]) if '--runs' in args else 5
+    max_ms = float(args[args.index('--max-ms') + 1]) if '--max-ms' in args else None
+
+    slow = []
+    print(f"{'function':>18} {'index ms':>9}  slowest shared modules")
+    for function in function_dirs():
+        try:
+            profiles = [import_profile(function) for _ in range(runs)]
+        except RuntimeError as e:
+            print(f'{function:>18} {"skipped":>9}  {e}')
+            continue
+
+        medians = {name: statistics.median(profile.get(name, 0) for profile in profiles) / 1000 for name in profiles[0]}
+        total = medians.pop('index', 0.0)
+        shared = ', '.join(f'{name[7:]} {ms:.1f}' for name, ms in sorted(medians.items(), key=lambda item: -item[1])[:3])
+        print(f'{function:>18} {total:>9.1f}  {shared}')
+        if max_ms is not None and total > max_ms:
+            slow.append(function)
+
+    if slow:
+        print(f"over {max_ms} ms: {', '.join(slow)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
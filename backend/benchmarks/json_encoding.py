@@ -0,0 +1,100 @@
+"""
+Benchmark: shared.fast_json vs per-row dict copies with isoformat and json.dumps.
+
+Usage: python backend/benchmarks/json_encoding.py [repeat]
+Payloads are shaped like a full bots-api list page, a large bot list and a
+bot's training data (bot_training_data rows). "before" is how bots-api
+built bodies from RealDictCursor rows; "stdlib" and "orjson" build them
+from cursor tuples with records() and the two dumps backends. Every
+variant is checked to decode to the same JSON first.
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from shared import fast_json
+from shared.fast_json import records, stdlib_dumps
+
+BOT_COLUMNS = ['id', 'name', 'description', 'is_active', 'ai_model', 'created_at', 'updated_at']
+TRAINING_COLUMNS = ['id', 'bot_id', 'question', 'answer', 'category', 'created_at', 'updated_at']
+WORDS = 'привет как оформить заказ доставка оплата цена товар магазин вопрос ответ спасибо hello order price'.split()
+
+
+def phrase(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def bot_rows(rng: random.Random, count: int) -> list:
+    start = datetime(2025, 1, 1, 9, 30)
+    return [
+        (
+            i, f'Бот {i}', phrase(rng, 12), rng.random() < 0.8, rng.choice(['deepseek', 'gpt-4o-mini']),
+            start + timedelta(minutes=i, microseconds=rng.randint(0, 999999)), start + timedelta(days=1, minutes=i)
+        )
+        for i in range(count)
+    ]
+
+
+def training_rows(rng: random.Random, count: int) -> list:
+    start = datetime(2025, 1, 1)
+    return [
+        (i, 7, phrase(rng, 8) + '?', phrase(rng, 30), rng.choice(['доставка', 'оплата', None]), start + timedelta(seconds=i), start + timedelta(seconds=i))
+        for i in range(count)
+    ]
+
+
+def before(columns: list, rows: list, key: str) -> str:
+    """RealDictCursor rows, copied and converted field by field, then json.dumps"""
+    dict_rows = [dict(zip(columns, row)) for row in rows]
+    items = []
+    for row in dict_rows:
+        item = dict(row)
+        item['created_at'] = item['created_at'].isoformat() if item.get('created_at') else None
+        item['updated_at'] = item['updated_at'].isoformat() if item.get('updated_at') else None
+        items.append(item)
+    return json.dumps({key: items})
+
+
+def timed(function, *args, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(repeat: int) -> None:
+    rng = random.Random(0)
+    payloads = {
+        'bot list page (200)': (BOT_COLUMNS, bot_rows(rng, 200), 'bots'),
+        'bot list (5000)': (BOT_COLUMNS, bot_rows(rng, 5000), 'bots'),
+        'training data (20000)': (TRAINING_COLUMNS, training_rows(rng, 20000), 'training_data'),
+    }
+    variants = {'stdlib': stdlib_dumps}
+    if fast_json.orjson is not None:
+        variants['orjson'] = fast_json.orjson_dumps
+    else:
+        print('orjson is not installed, timing the stdlib fallback only')
+
+    print(f'{"payload":>22} {"before":>9} ' + ' '.join(f'{name:>9} {"speedup":>7}' for name in variants))
+    for name, (columns, rows, key) in payloads.items():
+        expected = json.loads(before(columns, rows, key))
+        for dumps in variants.values():
+            assert json.loads(dumps({key: records(columns, rows)})) == expected, name
+
+        runs = max(1, repeat * 200 // len(rows))
+        baseline = timed(before, columns, rows, key, repeat=runs)
+        line = f'{name:>22} {baseline * 1e3:>7.2f}ms '
+        for dumps in variants.values():
+            elapsed = timed(lambda: dumps({key: records(columns, rows)}), repeat=runs)
+            line += f'{elapsed * 1e3:>7.2f}ms {baseline / elapsed:>6.1f}x '
+        print(line.rstrip())
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,98 @@
+"""
+Benchmark: pure Python vs CSR sparse scoring in ml-chat.
+
+Usage: python backend/benchmarks/ml_chat_scoring.py [rows ...]
+Default sizes are 1k, 10k and 100k synthetic training rows.
+Also checks that both backends pick the same answers.
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.tfidf_index import TfidfIndex
+from shared.sparse_index import SparseTfidfIndex, sparse_available
+
+SEED_ROWS = [
+    ('привет', 'Здравствуйте! Чем могу помочь?'),
+    ('здравствуйте', 'Привет! Рад вас видеть!'),
+    ('добрый день', 'Добрый день! Как дела?'),
+    ('как дела', 'Отлично, спасибо! А у вас?'),
+    ('спасибо', 'Всегда пожалуйста!'),
+    ('благодарю', 'Рад помочь!'),
+    ('помощь', 'Конечно помогу! Опишите вашу задачу подробнее.'),
+    ('что ты умеешь', 'Я могу отвечать на вопросы, помогать с информацией и обучаться на ваших примерах!'),
+    ('пока', 'До свидания! Обращайтесь ещё!'),
+    ('до свидания', 'Пока! Хорошего дня!'),
+]
+
+SYLLABLES = ['ка', 'ро', 'ми', 'на', 'ст', 'ле', 'во', 'ту', 'зе', 'ри', 'по', 'да', 'бы', 'че']
+QUERIES = 200
+
+
+def make_vocabulary(size: int, rng: random.Random):
+    return [''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(size)]
+
+
+def make_rows(count: int, vocabulary, rng: random.Random):
+    rows = [{'id': i + 1, 'question': q, 'answer': a} for i, (q, a) in enumerate(SEED_ROWS)]
+    for i in range(len(rows), count):
+        words = rng.choices(vocabulary, k=rng.randint(2, 10))
+        rows.append({'id': i + 1, 'question': ' '.join(words), 'answer': f'ответ {i}'})
+    return rows
+
+
+def timed_search(index, queries):
+    start = time.perf_counter()
+    results = [index.search(query, k=5) for query in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def same_answers(index, python_results, sparse_results) -> bool:
+    for expected, actual in zip(python_results, sparse_results):
+        if [index.row(doc) for _, doc in expected[:1]] != [index.row(doc) for _, doc in actual[:1]]:
+            return False
+    return True
+
+
+def main(sizes):
+    if not sparse_available():
+        print('NumPy/SciPy not installed: only the pure Python backend is available')
+        return
+
+    for query in ('привет', 'Привет!', 'что ты умеешь?'):
+        python_top = TfidfIndex.from_rows(make_rows(len(SEED_ROWS), [], random.Random(0))).search(query)
+        sparse_top = SparseTfidfIndex.from_rows(make_rows(len(SEED_ROWS), [], random.Random(0))).search(query)
+        assert [doc for _, doc in python_top] == [doc for _, doc in sparse_top], query
+
+    print(f'{"rows":>8} {"build py":>10} {"build csr":>10} {"query py":>10} {"query csr":>10} {"speedup":>8} same')
+    for size in sizes:
+        rng = random.Random(size)
+        vocabulary = make_vocabulary(max(500, size // 10), rng)
+        rows = make_rows(size, vocabulary, rng)
+        queries = [' '.join(rng.choices(vocabulary, k=rng.randint(1, 6))) for _ in range(QUERIES)]
+
+        start = time.perf_counter()
+        python_index = TfidfIndex.from_rows(rows)
+        python_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sparse_index = SparseTfidfIndex.from_rows(rows)
+        sparse_index.matrix()
+        sparse_build = time.perf_counter() - start
+
+        python_query, python_results = timed_search(python_index, queries)
+        sparse_query, sparse_results = timed_search(sparse_index, queries)
+
+        print(
+            f'{size:>8} {python_build * 1000:>8.1f}ms {sparse_build * 1000:>8.1f}ms '
+            f'{python_query * 1000:>8.3f}ms {sparse_query * 1000:>8.3f}ms '
+            f'{python_query / sparse_query:>7.1f}x {same_answers(python_index, python_results, sparse_results)}'
+        )
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
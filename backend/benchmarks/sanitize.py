@@ -0,0 +1,89 @@
+"""
+Benchmark: sanitize_input / sanitize_many vs the previous multi-regex sanitizer.
+
+Usage: python backend/benchmarks/sanitize.py [cases]
+First checks identical output on a random corpus of Cyrillic and ASCII
+text mixed with tags, HTML special and control characters, then times
+long Cyrillic texts (OCR-sized, 10k chars) from plain to tag-dense and a
+bulk knowledge import.
+"""
+
+import html
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from shared.security import sanitize_input, sanitize_many
+
+WORDS = 'привет как оформить заказ доставка оплата цена товар магазин вопрос ответ спасибо hello order price'.split()
+NOISE = ['<b>', '</b>', '<a href="x">', '<', '>', '&', '"', "'", '\x00', '\x07', '\x0b', '\x1f', '\x7f', '\t', '\n', '  ', '<br/>', 'ё', '№']
+
+
+def reference_sanitize(text, max_length=1000):
+    """sanitize_input before the single-pass rewrite: tags, html.escape, control characters"""
+    if not text:
+        return ''
+    text = str(text)[:max_length]
+    text = re.sub(r'<[^>]*>', '', text)
+    text = html.escape(text)
+    text = re.sub(r'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f]', '', text)
+    return text.strip()
+
+
+def random_text(rng: random.Random, length: int, noise: float) -> str:
+    parts = []
+    while sum(len(part) for part in parts) < length:
+        parts.append(rng.choice(NOISE) if rng.random() < noise else rng.choice(WORDS) + ' ')
+    return ''.join(parts)
+
+
+def check_equivalence(cases: int) -> None:
+    rng = random.Random(0)
+    for case in range(cases):
+        text = random_text(rng, rng.randint(0, 300), rng.choice([0.0, 0.01, 0.1, 0.5]))
+        max_length = rng.choice([5, 50, 1000])
+        expected = reference_sanitize(text, max_length)
+        assert sanitize_input(text, max_length) == expected, (case, text, max_length)
+
+    for _ in range(cases // 10):
+        batch = [random_text(rng, rng.randint(0, 100), rng.choice([0.0, 0.05])) for _ in range(rng.randint(0, 20))]
+        batch += [None, '', 0, 12345][:rng.randint(0, 4)]
+        assert sanitize_many(batch, 60) == [reference_sanitize(text, 60) for text in batch], batch
+
+
+def timed(function, *args, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(cases: int) -> None:
+    check_equivalence(cases)
+    print(f'equivalence: {cases} random texts identical')
+
+    rng = random.Random(1)
+    texts = {
+        'ocr 10k plain': random_text(rng, 10000, 0.0),
+        'ocr 10k markup': random_text(rng, 10000, 0.02),
+        'ocr 10k tag soup': random_text(rng, 10000, 0.2),
+        'short question': 'Как оформить заказ и сколько стоит доставка?',
+    }
+    print(f'{"input":>20} {"before":>10} {"after":>10} {"speedup":>8}')
+    for name, text in texts.items():
+        before = timed(reference_sanitize, text, 10000, repeat=2000)
+        after = timed(sanitize_input, text, 10000, repeat=2000)
+        print(f'{name:>20} {before * 1e6:>8.1f}us {after * 1e6:>8.1f}us {before / after:>7.1f}x')
+
+    entries = [random_text(rng, rng.randint(100, 2000), 0.0) for _ in range(1000)]
+    before = timed(lambda: [reference_sanitize(text, 5000) for text in entries], repeat=20)
+    after = timed(sanitize_many, entries, 5000, repeat=20)
+    print(f'{"1000 entries batch":>20} {before * 1e3:>8.1f}ms {after * 1e3:>8.1f}ms {before / after:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
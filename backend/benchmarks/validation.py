@@ -0,0 +1,127 @@
+"""
+Benchmark: compiled schemas vs per-request schema interpretation.
+
+Usage: python backend/benchmarks/validation.py [iterations]
+Uses the real module-level schemas of bots-api and ai-tools on valid and
+invalid request bodies. Also checks that the compiled validators report
+the same first error per field as the interpreted validate_input did.
+"""
+
+import importlib.util
+import os
+import re
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+from shared.security import CompiledSchema
+
+TOKEN = '1234567890:' + 'A' * 35
+
+BODIES = {
+    'CREATE_BOT_SCHEMA': [
+        {'name': 'Support bot', 'telegram_token': TOKEN + 'xxxxxx', 'description': 'Отвечает на вопросы', 'ai_model': 'deepseek'},
+        {'name': '', 'telegram_token': 'short', 'ai_prompt': 'x' * 6000},
+        {'name': 42, 'description': None},
+    ],
+    'UPDATE_BOT_SCHEMA': [{'id': 7, 'name': 'New name'}, {'id': 0}, {'id': 'seven'}],
+    'ACTION_SCHEMA': [{'action': 'auto_learn'}, {'action': ''}, {'action': 'x' * 80}],
+    'AUTO_LEARN_SCHEMA': [
+        {'bot_id': 1, 'lookback_days': 30, 'min_frequency': 3, 'limit': 50},
+        {'bot_id': 1, 'lookback_days': 99999, 'limit': 0},
+        {'bot_id': '1'},
+    ],
+    'CRM_SYNC_SCHEMA': [
+        {'api_key': 'k' * 40, 'subdomain': 'company'},
+        {'api_key': 'short', 'subdomain': 'Bad Domain!'},
+    ],
+    'OCR_SCHEMA': [{'image_url': 'https://example.com/scan.png'}, {}],
+    'KNOWLEDGE_UPDATE_SCHEMA': [{'bot_id': 3, 'entries': [{'question': 'q', 'answer': 'a'}]}, {'bot_id': 3, 'entries': {}}, {'bot_id': 3, 'entries': []}],
+}
+
+
+def load_function(name: str):
+    """index.py of a function, importable with its sibling modules the way the runtime loads it"""
+    function_dir = os.path.join(BACKEND_DIR, name)
+    if function_dir not in sys.path:
+        sys.path.insert(1, function_dir)
+    spec = importlib.util.spec_from_file_location(name.replace('-', '_'), os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def interpreted_validate(data, schema):
+    """validate_input as it was before compile_schema: rules walked on every call"""
+    errors = []
+    for field, rules in schema.items():
+        value = data.get(field)
+        if rules.get('required') and not value:
+            errors.append(f'{field} is required')
+            continue
+        if value is not None:
+            expected_type = rules.get('type')
+            if expected_type and not isinstance(value, expected_type):
+                errors.append(f'{field} must be {expected_type.__name__}')
+                continue
+            if isinstance(value, str):
+                if 'max_len' in rules and len(value) > rules['max_len']:
+                    errors.append(f'{field} exceeds max length {rules["max_len"]}')
+                if 'min_len' in rules and len(value) < rules['min_len']:
+                    errors.append(f'{field} is too short (min {rules["min_len"]})')
+                if 'pattern' in rules and not re.match(rules['pattern'], value):
+                    errors.append(f'{field} format is invalid')
+            if isinstance(value, (int, float)):
+                if 'min' in rules and value < rules['min']:
+                    errors.append(f'{field} must be >= {rules["min"]}')
+                if 'max' in rules and value > rules['max']:
+                    errors.append(f'{field} must be <= {rules["max"]}')
+    return errors
+
+
+def first_per_field(errors, schema):
+    firsts = []
+    for field in schema:
+        matching = [error for error in errors if error.startswith(field + ' ')]
+        if matching:
+            firsts.append(matching[0])
+    return firsts
+
+
+def main(iterations: int) -> None:
+    modules = [load_function('bots-api'), load_function('ai-tools')]
+    schemas = {
+        name: getattr(module, name)
+        for module in modules for name in BODIES if isinstance(getattr(module, name, None), CompiledSchema)
+    }
+    missing = set(BODIES) - set(schemas)
+    assert not missing, f'schemas not found: {missing}'
+
+    print(f'{"schema":>24} {"interpreted":>12} {"compiled":>10} {"speedup":>8} same')
+    for name, bodies in BODIES.items():
+        compiled = schemas[name]
+        same = all(compiled(body) == first_per_field(interpreted_validate(body, compiled.schema), compiled.schema) for body in bodies)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for body in bodies:
+                interpreted_validate(body, compiled.schema)
+        interpreted = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for body in bodies:
+                compiled(body)
+        compiled_time = time.perf_counter() - start
+
+        per_call = 1e6 / (iterations * len(bodies))
+        print(
+            f'{name:>24} {interpreted * per_call:>10.2f}us {compiled_time * per_call:>8.2f}us '
+            f'{interpreted / compiled_time:>7.1f}x {same}'
+        )
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,149 @@
+"""
+Export of a bot's training data and conversation history as NDJSON or CSV.
+Rows are read in id order through a named (server-side) cursor, one chunk
+at a time, and written until the response byte budget is spent, so memory
+stays bounded whatever the table size. A page that stops early carries a
+resume token; calling again with it continues after the last exported id.
+The first page pins the highest id, so rows written during a long export
+do not keep it running forever. The export holds users' messages, so
+bots-api serves it only to callers sending the EXPORT_TOKEN secret.
+"""
+
+import base64
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from shared.fast_json import dumps
+
+EXPORT_TABLES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    'training_data': ('bot_training_data', ('id', 'bot_id', 'question', 'answer', 'category', 'created_at', 'updated_at')),
+    'messages': ('messages', ('id', 'bot_id', 'user_id', 'username', 'message_text', 'response_text', 'created_at')),
+}
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', '2000'))
+# Below the platform's limit on the response size
+MAX_BYTES = int(os.environ.get('EXPORT_MAX_BYTES', str(3 * 1024 * 1024)))
+
+
+class ExportRequest(NamedTuple):
+    kind: str
+    bot_id: int
+    fmt: str
+    after_id: int
+    upper_id: Optional[int]
+
+
+class ExportPage(NamedTuple):
+    body: str
+    rows: int
+    resume: Optional[str]
+
+
+def encode_resume(request: ExportRequest, after_id: int, upper_id: int) -> str:
+    raw = json.dumps([request.kind, request.bot_id, after_id, upper_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_resume(token: str) -> Tuple[str, int, int, int]:
+    raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    kind, bot_id, after_id, upper_id = json.loads(raw)
+    return str(kind), int(bot_id), int(after_id), int(upper_id)
+
+
+def parse_export_request(params: Dict[str, str]) -> Tuple[Optional[ExportRequest], Optional[str]]:
+    """ExportRequest from the query string, or (None, error message)"""
+    kind = params.get('table', 'training_data')
+    if kind not in EXPORT_TABLES:
+        return None, f"table must be one of: {', '.join(EXPORT_TABLES)}"
+    fmt = params.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return None, f"format must be one of: {', '.join(EXPORT_FORMATS)}"
+    try:
+        bot_id = int(params.get('bot_id') or 0)
+    except ValueError:
+        bot_id = 0
+    if bot_id < 1:
+        return None, 'bot_id must be a positive integer'
+
+    if not params.get('resume'):
+        return ExportRequest(kind, bot_id, fmt, 0, None), None
+    try:
+        token_kind, token_bot_id, after_id, upper_id = decode_resume(params['resume'])
+    except (ValueError, TypeError):
+        return None, 'Invalid resume token'
+    if (token_kind, token_bot_id) != (kind, bot_id):
+        return None, 'Resume token belongs to another export'
+    return ExportRequest(kind, bot_id, fmt, after_id, upper_id), None
+
+
+def _plain(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def _line_encoder(fmt: str, columns: Sequence[str]):
+    """Function turning one cursor tuple into one output line"""
+    if fmt == 'ndjson':
+        return lambda row: dumps(dict(zip(columns, row))) + '\n'
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    def csv_line(row: Sequence[Any]) -> str:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([_plain(value) for value in row])
+        return buffer.getvalue()
+    return csv_line
+
+
+def export_page(conn, request: ExportRequest, max_bytes: int = MAX_BYTES, chunk_rows: int = CHUNK_ROWS) -> ExportPage:
+    """
+    One page of the export: rows after request.after_id up to the pinned
+    upper id, at most max_bytes of output (but always at least one row)
+    """
+    table, columns = EXPORT_TABLES[request.kind]
+    upper_id = request.upper_id
+    if upper_id is None:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table} WHERE bot_id = %s", (request.bot_id,))
+            upper_id = cur.fetchone()[0]
+
+    encode = _line_encoder(request.fmt, columns)
+    out = io.StringIO()
+    size = 0
+    if request.fmt == 'csv' and request.after_id == 0:
+        size += out.write(encode(columns))
+
+    rows = 0
+    last_id = request.after_id
+    full = False
+    with conn.cursor(name=f'export_{request.kind}') as cur:
+        cur.itersize = chunk_rows
+        cur.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE bot_id = %s AND id > %s AND id <= %s ORDER BY id",
+            (request.bot_id, request.after_id, upper_id)
+        )
+        while not full:
+            chunk = cur.fetchmany(chunk_rows)
+            if not chunk:
+                break
+            for row in chunk:
+                line = encode(row)
+                line_bytes = len(line.encode('utf-8'))
+                if rows and size + line_bytes > max_bytes:
+                    full = True
+                    break
+                out.write(line)
+                size += line_bytes
+                rows += 1
+                last_id = row[0]
+
+    resume = encode_resume(request, last_id, upper_id) if full else None
+    return ExportPage(out.getvalue(), rows, resume)
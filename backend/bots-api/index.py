@@ -1,73 +1,328 @@
+import base64
 import json
 import os
+from datetime import datetime
+from operator import itemgetter
 from typing import Dict, Any
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import html
-import re
-import time
-from collections import defaultdict
+from psycopg2.extras import RealDictCursor, execute_values
+import secrets
 
-request_counts = defaultdict(list)
+from export import EXPORT_FORMATS, export_page, parse_export_request
+from response_cache import PRIVATE_CACHE_CONTROL, PUBLIC_CACHE_CONTROL, ResponseCache, cache_key, etag_matches, make_etag
+from shared.fast_json import dumps, records
+from shared.pg_pool import get_connection
+from shared.rate_limit import check_rate_limit, configure as configure_rate_limit
+from shared.security import compile_schema, extract_ip, safe_error_response, sanitize_input, validate_input, validate_telegram_token
 
-def get_cors_headers(event):
-    return {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-        'Access-Control-Max-Age': '86400',
-        'Content-Type': 'application/json'
-    }
+def execute_rate_limit_query(query, params):
+    with get_connection(os.environ.get('DATABASE_URL', '')) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        conn.commit()
+        return rows
+
+configure_rate_limit(execute_rate_limit_query)
+
+CREATE_BOT_SCHEMA = compile_schema({
+    'name': {'type': str, 'required': True, 'min_len': 1, 'max_len': 200},
+    'telegram_token': {'type': str, 'required': True, 'min_len': 40, 'max_len': 100},
+    'description': {'type': str, 'max_len': 1000},
+    'ai_model': {'type': str, 'max_len': 50},
+    'ai_prompt': {'type': str, 'max_len': 5000}
+})
+
+UPDATE_BOT_SCHEMA = compile_schema({
+    'id': {'type': int, 'required': True, 'min': 1}
+})
+
+BULK_UPDATE_SCHEMA = compile_schema({
+    'id': {'type': int, 'required': True, 'min': 1},
+    'name': {'type': str, 'max_len': 200},
+    'description': {'type': str, 'max_len': 1000},
+    'is_active': {'type': bool},
+    'ai_model': {'type': str, 'max_len': 50},
+    'ai_prompt': {'type': str, 'max_len': 5000}
+})
 
-def check_rate_limit(ip, limit=60, window=60):
-    now = time.time()
-    request_counts[ip] = [t for t in request_counts[ip] if now - t < window]
-    if len(request_counts[ip]) >= limit:
-        return False
-    request_counts[ip].append(now)
-    return True
+DEFAULT_AI_MODEL = 'deepseek'
+DEFAULT_AI_PROMPT = 'Ты вежливый помощник. Отвечай кратко и по делу.'
+NEW_BOT_COLUMNS = 'name, description, telegram_token, ai_model, ai_prompt, is_active, webhook_secret'
+UPDATABLE_FIELDS = {'name': 200, 'description': 1000, 'is_active': None, 'ai_model': 50, 'ai_prompt': 5000}
+UPDATE_CASTS = {'is_active': 'boolean'}
+BULK_MAX_ITEMS = 500
 
-def sanitize_input(text, max_len=1000):
-    if not text:
-        return ''
-    text = str(text)[:max_len]
-    text = re.sub(r'<[^>]*>', '', text)
-    text = html.escape(text)
-    return text.strip()
+BOT_LIST_FIELDS = ('id', 'name', 'description', 'is_active', 'ai_model', 'created_at', 'updated_at')
+BOT_SENSITIVE_FIELDS = ('telegram_token', 'ai_prompt', 'webhook_secret')
+BOT_FIELDS = BOT_LIST_FIELDS + ('config_version',) + BOT_SENSITIVE_FIELDS
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 200
+VERSION_FIELDS = ('created_at', 'id', 'updated_at', 'config_version')
 
-def validate_input(data, schema):
+response_cache = ResponseCache()
+
+def encode_cursor(created_at, bot_id):
+    raw = json.dumps([created_at.isoformat() if created_at else None, bot_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    created_at, bot_id = json.loads(raw)
+    return datetime.fromisoformat(created_at), int(bot_id)
+
+def requested_fields(params):
+    fields = params.get('fields')
+    if not fields:
+        return list(BOT_LIST_FIELDS)
+    return [field.strip() for field in fields.split(',') if field.strip()]
+
+def query_limit(params):
+    return int(params.get('limit') or LIST_DEFAULT_LIMIT)
+
+def build_list_query(params):
+    '''
+    Keyset-paginated listing: newest first by (created_at, id), only the
+    requested columns, optional is_active / ai_model filters.
+    Returns ((sql, args), None) or (None, error message).
+    '''
+    fields = requested_fields(params)
+    unknown = [field for field in fields if field not in BOT_FIELDS]
+    if unknown:
+        return None, f"Unknown fields: {', '.join(unknown)}"
+    
+    try:
+        limit = query_limit(params)
+    except ValueError:
+        return None, 'limit must be an integer'
+    if not 1 <= limit <= LIST_MAX_LIMIT:
+        return None, f'limit must be between 1 and {LIST_MAX_LIMIT}'
+    
+    conditions = []
+    args = []
+    if params.get('is_active') is not None:
+        if params['is_active'] not in ('true', 'false'):
+            return None, 'is_active must be true or false'
+        conditions.append('is_active = %s')
+        args.append(params['is_active'] == 'true')
+    if params.get('ai_model'):
+        conditions.append('ai_model = %s')
+        args.append(params['ai_model'])
+    if params.get('cursor'):
+        try:
+            created_at, bot_id = decode_cursor(params['cursor'])
+        except (ValueError, TypeError):
+            return None, 'Invalid cursor'
+        conditions.append('(created_at, id) < (%s, %s)')
+        args.extend([created_at, bot_id])
+    
+    columns = list(dict.fromkeys(fields + list(VERSION_FIELDS)))
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ''
+    sql = f"SELECT {', '.join(columns)} FROM bots {where}ORDER BY created_at DESC, id DESC LIMIT %s"
+    return (sql, tuple(args) + (limit + 1,)), None
+
+def list_versions(columns, rows):
+    '''(id, config_version, updated_at) of each cursor tuple, for the ETag'''
+    return map(itemgetter(columns.index('id'), columns.index('config_version'), columns.index('updated_at')), rows)
+
+def list_page(columns, rows, limit, fields):
+    '''One page of bots built from cursor tuples plus next_cursor when more rows follow'''
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][columns.index('created_at')], rows[-1][columns.index('id')])
+    return {'bots': records(columns, rows, fields), 'next_cursor': next_cursor}
+
+def new_bot_row(data):
+    '''Sanitized values of a new bot in NEW_BOT_COLUMNS order'''
+    return (
+        sanitize_input(data.get('name'), 200),
+        sanitize_input(data.get('description', ''), 1000),
+        data.get('telegram_token'),
+        sanitize_input(data.get('ai_model', DEFAULT_AI_MODEL), 50),
+        sanitize_input(data.get('ai_prompt', DEFAULT_AI_PROMPT), 5000),
+        True,
+        secrets.token_urlsafe(24)
+    )
+
+def update_changes(data):
+    '''Sanitized values of the updatable fields present in data'''
+    changes = {}
+    for field, max_len in UPDATABLE_FIELDS.items():
+        if field in data:
+            changes[field] = sanitize_input(data[field], max_len) if max_len else data[field]
+    return changes
+
+def bulk_items(body_data):
+    items = body_data.get('bots')
+    if not isinstance(items, list) or not items:
+        return None, 'bots must be a non-empty list'
+    if len(items) > BULK_MAX_ITEMS:
+        return None, f'At most {BULK_MAX_ITEMS} bots per request'
+    if not all(isinstance(item, dict) for item in items):
+        return None, 'Every item in bots must be an object'
+    return items, None
+
+def validate_bulk_create(items):
+    '''Per-item errors of a bulk create, checked before anything is written'''
+    errors = []
+    seen = {}
+    for index, item in enumerate(items):
+        item_errors = validate_input(item, CREATE_BOT_SCHEMA)
+        if not item_errors:
+            token = item['telegram_token']
+            if not validate_telegram_token(token):
+                item_errors = ['Invalid Telegram token format']
+            elif token in seen:
+                item_errors = [f'telegram_token duplicates item {seen[token]}']
+            seen.setdefault(token, index)
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+    return errors
+
+def validate_bulk_update(items):
     errors = []
-    for field, rules in schema.items():
-        value = data.get(field)
-        if rules.get('required') and not value:
-            errors.append(f'{field} is required')
-            continue
-        if value is not None:
-            if rules.get('type') and not isinstance(value, rules['type']):
-                errors.append(f'{field} must be {rules["type"].__name__}')
-                continue
-            if isinstance(value, str):
-                if 'max_len' in rules and len(value) > rules['max_len']:
-                    errors.append(f'{field} exceeds max length')
-                if 'min_len' in rules and len(value) < rules['min_len']:
-                    errors.append(f'{field} is too short')
-            if isinstance(value, int):
-                if 'min' in rules and value < rules['min']:
-                    errors.append(f'{field} too small')
+    seen = {}
+    for index, item in enumerate(items):
+        item_errors = validate_input(item, BULK_UPDATE_SCHEMA)
+        if not item_errors:
+            if item['id'] in seen:
+                item_errors = [f"id duplicates item {seen[item['id']]}"]
+            elif not any(field in item for field in UPDATABLE_FIELDS):
+                item_errors = ['No valid fields to update']
+            seen.setdefault(item['id'], index)
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
     return errors
 
-def validate_telegram_token(token):
-    pattern = r'^\d{8,10}:[A-Za-z0-9_-]{35}$'
-    return bool(re.match(pattern, token))
+def bulk_create(cur, items):
+    '''
+    Insert all bots with one multi-row INSERT ... RETURNING.
+    Returns (rows in input order, None) or (None, per-item errors) when
+    a token is already registered; the caller owns the transaction.
+    '''
+    tokens = [item['telegram_token'] for item in items]
+    cur.execute("SELECT telegram_token FROM bots WHERE telegram_token = ANY(%s)", (tokens,))
+    taken = {row['telegram_token'] for row in cur.fetchall()}
+    if taken:
+        return None, [
+            {'index': index, 'errors': ['telegram_token is already registered']}
+            for index, token in enumerate(tokens) if token in taken
+        ]
+    
+    rows = execute_values(
+        cur,
+        f"INSERT INTO bots ({NEW_BOT_COLUMNS}) VALUES %s RETURNING *",
+        [new_bot_row(item) for item in items],
+        page_size=len(items),
+        fetch=True
+    )
+    return rows, None
 
-def extract_ip(event):
-    return event.get('requestContext', {}).get('identity', {}).get('sourceIp', 'unknown')
+def bulk_update(cur, items):
+    '''
+    Apply all updates with UPDATE ... FROM (VALUES ...), one statement per
+    distinct set of changed fields. Returns (rows in input order, None) or
+    (None, per-item errors) when some ids do not exist.
+    '''
+    groups = {}
+    for item in items:
+        changes = update_changes(item)
+        groups.setdefault(tuple(changes), []).append((item['id'],) + tuple(changes.values()))
+    
+    updated = {}
+    for fields, values in groups.items():
+        assignments = ', '.join(f'{field} = v.{field}' for field in fields)
+        casts = ', '.join(f"%s::{UPDATE_CASTS.get(field, 'text')}" for field in fields)
+        rows = execute_values(
+            cur,
+            f"""
+            UPDATE bots b SET {assignments}, updated_at = CURRENT_TIMESTAMP, config_version = b.config_version + 1
+            FROM (VALUES %s) AS v (id, {', '.join(fields)})
+            WHERE b.id = v.id
+            RETURNING b.*
+            """,
+            values,
+            template=f'(%s::bigint, {casts})',
+            page_size=len(values),
+            fetch=True
+        )
+        updated.update((row['id'], row) for row in rows)
+    
+    missing = [
+        {'index': index, 'errors': ['Bot not found']}
+        for index, item in enumerate(items) if item['id'] not in updated
+    ]
+    if missing:
+        return None, missing
+    return [updated[item['id']] for item in items], None
 
-def safe_error_response(error, context):
+def handle_bulk(conn, cur, method, body_data):
+    '''
+    POST/PUT with {"bots": [...]}: the whole payload is validated first and
+    written in one transaction, nothing is written if any item fails.
+    Returns (status code, payload).
+    '''
+    items, error = bulk_items(body_data)
+    if error:
+        return 400, {'error': error}
+    
+    if method == 'POST':
+        errors = validate_bulk_create(items)
+        if errors:
+            return 400, {'errors': errors}
+        rows, errors = bulk_create(cur, items)
+        failed_status, success_status = 409, 201
+    else:
+        errors = validate_bulk_update(items)
+        if errors:
+            return 400, {'errors': errors}
+        rows, errors = bulk_update(cur, items)
+        failed_status, success_status = 404, 200
+    
+    if errors:
+        conn.rollback()
+        return failed_status, {'errors': errors}
+    conn.commit()
+    response_cache.clear()
+    return success_status, {'bots': rows}
+
+def get_header(event, name):
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def export_allowed(event):
+    '''Exports are served only with X-Auth-Token equal to EXPORT_TOKEN; without it set, never'''
+    expected = os.environ.get('EXPORT_TOKEN', '')
+    provided = get_header(event, 'X-Auth-Token') or ''
+    return bool(expected) and secrets.compare_digest(provided.encode('utf-8'), expected.encode('utf-8'))
+
+def conditional_response(event, cors_headers, etag, body, cache_control):
+    '''200 with the body, or 304 when the client already has this ETag'''
+    headers = {**cors_headers, 'ETag': etag, 'Cache-Control': cache_control}
+    if etag_matches(get_header(event, 'If-None-Match'), etag):
+        return {
+            'statusCode': 304,
+            'headers': headers,
+            'isBase64Encoded': False,
+            'body': ''
+        }
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'isBase64Encoded': False,
+        'body': body
+    }
+
+def get_cors_headers(event):
     return {
-        'statusCode': 500,
-        'headers': {'Content-Type': 'application/json'},
-        'body': json.dumps({'error': 'Internal server error'})
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token, If-None-Match',
+        'Access-Control-Expose-Headers': 'ETag, X-Export-Resume, X-Export-Rows',
+        'Access-Control-Max-Age': '86400',
+        'Content-Type': 'application/json'
     }
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -88,11 +343,11 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     ip_address = extract_ip(event)
-    if not check_rate_limit(ip_address, limit=60, window=60):
+    if not check_rate_limit(f'bots-api:{ip_address}', limit=60, window=60):
         return {
             'statusCode': 429,
             'headers': cors_headers,
-            'body': json.dumps({'error': 'Too many requests'})
+            'body': dumps({'error': 'Too many requests'})
         }
     
     db_url = os.environ.get('DATABASE_URL')
@@ -101,188 +356,207 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'statusCode': 500,
             'headers': cors_headers,
             'isBase64Encoded': False,
-            'body': json.dumps({'error': 'DATABASE_URL not configured'})
+            'body': dumps({'error': 'DATABASE_URL not configured'})
+        }
+    
+    if method == 'GET' and (event.get('queryStringParameters') or {}).get('action') == 'export':
+        if not export_allowed(event):
+            return {
+                'statusCode': 403,
+                'headers': cors_headers,
+                'isBase64Encoded': False,
+                'body': dumps({'error': 'Export requires a valid X-Auth-Token'})
+            }
+        export_request, error = parse_export_request(event['queryStringParameters'])
+        if error:
+            return {
+                'statusCode': 400,
+                'headers': cors_headers,
+                'isBase64Encoded': False,
+                'body': dumps({'error': error})
+            }
+        
+        try:
+            with get_connection(db_url) as conn:
+                page = export_page(conn, export_request)
+        except Exception as e:
+            return safe_error_response(e, context)
+        
+        headers = {
+            **cors_headers,
+            'Content-Type': EXPORT_FORMATS[export_request.fmt],
+            'Cache-Control': 'no-store',
+            'X-Export-Rows': str(page.rows)
+        }
+        if page.resume:
+            headers['X-Export-Resume'] = page.resume
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'isBase64Encoded': False,
+            'body': page.body
         }
     
+    if method == 'GET':
+        params = event.get('queryStringParameters') or {}
+        key = cache_key(params)
+        cached = response_cache.get(key)
+        if cached:
+            return conditional_response(event, cors_headers, *cached)
+    
+    if method in ('POST', 'PUT'):
+        try:
+            body_data = json.loads(event.get('body') or '{}')
+        except ValueError:
+            body_data = None
+        if not isinstance(body_data, dict):
+            return {
+                'statusCode': 400,
+                'headers': cors_headers,
+                'isBase64Encoded': False,
+                'body': dumps({'error': 'Request body must be a JSON object'})
+            }
+    
     try:
-        conn = psycopg2.connect(db_url)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        with get_connection(db_url) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
         
-        if method == 'GET':
-            params = event.get('queryStringParameters') or {}
-            bot_id = params.get('id')
+            if method == 'GET':
+                bot_id = params.get('id')
             
-            if bot_id:
-                cur.execute(
-                    "SELECT * FROM bots WHERE id = %s",
-                    (bot_id,)
-                )
-                bot = cur.fetchone()
+                if bot_id:
+                    cur.execute(
+                        "SELECT * FROM bots WHERE id = %s",
+                        (bot_id,)
+                    )
+                    bot = cur.fetchone()
                 
-                if bot:
-                    bot_dict = dict(bot)
-                    bot_dict['created_at'] = bot_dict['created_at'].isoformat() if bot_dict.get('created_at') else None
-                    bot_dict['updated_at'] = bot_dict['updated_at'].isoformat() if bot_dict.get('updated_at') else None
-                    
-                    return {
-                        'statusCode': 200,
-                        'headers': cors_headers,
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'bot': bot_dict})
-                    }
+                    if bot:
+                        etag = make_etag('bot', key, [(bot['id'], bot.get('config_version'), bot.get('updated_at'))])
+                        body = dumps({'bot': bot})
+                        
+                        response_cache.put(key, etag, body, PRIVATE_CACHE_CONTROL)
+                        return conditional_response(event, cors_headers, etag, body, PRIVATE_CACHE_CONTROL)
+                    else:
+                        return {
+                            'statusCode': 404,
+                            'headers': cors_headers,
+                            'isBase64Encoded': False,
+                            'body': dumps({'error': 'Bot not found'})
+                        }
                 else:
-                    return {
-                        'statusCode': 404,
-                        'headers': cors_headers,
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'error': 'Bot not found'})
-                    }
-            else:
-                cur.execute("SELECT * FROM bots ORDER BY created_at DESC")
-                bots = cur.fetchall()
-                
-                bots_list = []
-                for bot in bots:
-                    bot_dict = dict(bot)
-                    bot_dict['created_at'] = bot_dict['created_at'].isoformat() if bot_dict.get('created_at') else None
-                    bot_dict['updated_at'] = bot_dict['updated_at'].isoformat() if bot_dict.get('updated_at') else None
-                    bots_list.append(bot_dict)
-                
+                    query, error = build_list_query(params)
+                    if error:
+                        return {
+                            'statusCode': 400,
+                            'headers': cors_headers,
+                            'isBase64Encoded': False,
+                            'body': dumps({'error': error})
+                        }
+                    
+                    with conn.cursor() as rows_cur:
+                        rows_cur.execute(*query)
+                        columns = [column[0] for column in rows_cur.description]
+                        rows = rows_cur.fetchall()
+                    etag = make_etag('list', key, list_versions(columns, rows))
+                    fields = requested_fields(params)
+                    body = dumps(list_page(columns, rows, query_limit(params), fields))
+                    cache_control = PRIVATE_CACHE_CONTROL if set(fields) & set(BOT_SENSITIVE_FIELDS) else PUBLIC_CACHE_CONTROL
+                    
+                    response_cache.put(key, etag, body, cache_control)
+                    return conditional_response(event, cors_headers, etag, body, cache_control)
+        
+            elif method in ('POST', 'PUT') and 'bots' in body_data:
+                status, payload = handle_bulk(conn, cur, method, body_data)
                 return {
-                    'statusCode': 200,
+                    'statusCode': status,
                     'headers': cors_headers,
                     'isBase64Encoded': False,
-                    'body': json.dumps({'bots': bots_list})
+                    'body': dumps(payload)
                 }
         
-        elif method == 'POST':
-            body_data = json.loads(event.get('body', '{}'))
-            
-            errors = validate_input(body_data, {
-                'name': {'type': str, 'required': True, 'min_len': 1, 'max_len': 200},
-                'telegram_token': {'type': str, 'required': True, 'min_len': 40, 'max_len': 100},
-                'description': {'type': str, 'max_len': 1000},
-                'ai_model': {'type': str, 'max_len': 50},
-                'ai_prompt': {'type': str, 'max_len': 5000}
-            })
-            if errors:
-                return {
-                    'statusCode': 400,
-                    'headers': cors_headers,
-                    'body': json.dumps({'errors': errors})
-                }
-            
-            telegram_token = body_data.get('telegram_token')
-            if not validate_telegram_token(telegram_token):
-                return {
-                    'statusCode': 400,
-                    'headers': cors_headers,
-                    'body': json.dumps({'error': 'Invalid Telegram token format'})
-                }
-            
-            name = sanitize_input(body_data.get('name'), 200)
-            description = sanitize_input(body_data.get('description', ''), 1000)
-            ai_model = sanitize_input(body_data.get('ai_model', 'deepseek'), 50)
-            ai_prompt = sanitize_input(body_data.get('ai_prompt', 'Ты вежливый помощник. Отвечай кратко и по делу.'), 5000)
-            
-            cur.execute(
-                """
-                INSERT INTO bots (name, description, telegram_token, ai_model, ai_prompt, is_active)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING *
-                """,
-                (name, description, telegram_token, ai_model, ai_prompt, True)
-            )
+            elif method == 'POST':
+                errors = validate_input(body_data, CREATE_BOT_SCHEMA)
+                if errors:
+                    return {
+                        'statusCode': 400,
+                        'headers': cors_headers,
+                        'body': dumps({'errors': errors})
+                    }
             
-            new_bot = cur.fetchone()
-            conn.commit()
+                telegram_token = body_data.get('telegram_token')
+                if not validate_telegram_token(telegram_token):
+                    return {
+                        'statusCode': 400,
+                        'headers': cors_headers,
+                        'body': dumps({'error': 'Invalid Telegram token format'})
+                    }
             
-            bot_dict = dict(new_bot)
-            bot_dict['created_at'] = bot_dict['created_at'].isoformat() if bot_dict.get('created_at') else None
-            bot_dict['updated_at'] = bot_dict['updated_at'].isoformat() if bot_dict.get('updated_at') else None
+                cur.execute(
+                    f"INSERT INTO bots ({NEW_BOT_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING *",
+                    new_bot_row(body_data)
+                )
             
-            return {
-                'statusCode': 201,
-                'headers': cors_headers,
-                'isBase64Encoded': False,
-                'body': json.dumps({'bot': bot_dict})
-            }
-        
-        elif method == 'PUT':
-            body_data = json.loads(event.get('body', '{}'))
+                new_bot = cur.fetchone()
+                conn.commit()
+                response_cache.clear()
             
-            errors = validate_input(body_data, {
-                'id': {'type': int, 'required': True, 'min': 1}
-            })
-            if errors:
                 return {
-                    'statusCode': 400,
+                    'statusCode': 201,
                     'headers': cors_headers,
-                    'body': json.dumps({'errors': errors})
+                    'isBase64Encoded': False,
+                    'body': dumps({'bot': new_bot})
                 }
+        
+            elif method == 'PUT':
+                errors = validate_input(body_data, UPDATE_BOT_SCHEMA)
+                if errors:
+                    return {
+                        'statusCode': 400,
+                        'headers': cors_headers,
+                        'body': dumps({'errors': errors})
+                    }
             
-            bot_id = body_data.get('id')
-            
-            ALLOWED_FIELDS = {'name', 'description', 'is_active', 'ai_model', 'ai_prompt'}
-            update_fields = []
-            update_values = []
+                bot_id = body_data.get('id')
             
-            for field in body_data:
-                if field in ALLOWED_FIELDS:
-                    if field == 'name':
-                        value = sanitize_input(body_data[field], 200)
-                    elif field == 'description':
-                        value = sanitize_input(body_data[field], 1000)
-                    elif field == 'ai_model':
-                        value = sanitize_input(body_data[field], 50)
-                    elif field == 'ai_prompt':
-                        value = sanitize_input(body_data[field], 5000)
-                    else:
-                        value = body_data[field]
-                    
-                    update_fields.append(f'{field} = %s')
-                    update_values.append(value)
+                changes = update_changes(body_data)
+                update_fields = [f'{field} = %s' for field in changes]
+                update_values = list(changes.values())
             
-            if not update_fields:
-                return {
-                    'statusCode': 400,
-                    'headers': cors_headers,
-                    'body': json.dumps({'error': 'No valid fields to update'})
-                }
+                if not update_fields:
+                    return {
+                        'statusCode': 400,
+                        'headers': cors_headers,
+                        'body': dumps({'error': 'No valid fields to update'})
+                    }
             
-            update_fields.append('updated_at = CURRENT_TIMESTAMP')
-            update_values.append(bot_id)
+                update_fields.append('updated_at = CURRENT_TIMESTAMP')
+                update_fields.append('config_version = config_version + 1')
+                update_values.append(bot_id)
             
-            cur.execute(
-                f"UPDATE bots SET {', '.join(update_fields)} WHERE id = %s RETURNING *",
-                tuple(update_values)
-            )
+                cur.execute(
+                    f"UPDATE bots SET {', '.join(update_fields)} WHERE id = %s RETURNING *",
+                    tuple(update_values)
+                )
             
-            updated_bot = cur.fetchone()
-            conn.commit()
+                updated_bot = cur.fetchone()
+                conn.commit()
+                response_cache.clear()
             
-            if updated_bot:
-                bot_dict = dict(updated_bot)
-                bot_dict['created_at'] = bot_dict['created_at'].isoformat() if bot_dict.get('created_at') else None
-                bot_dict['updated_at'] = bot_dict['updated_at'].isoformat() if bot_dict.get('updated_at') else None
-                
-                return {
-                    'statusCode': 200,
-                    'headers': cors_headers,
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'bot': bot_dict})
-                }
-            else:
-                return {
-                    'statusCode': 404,
-                    'headers': cors_headers,
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'Bot not found'})
-                }
-        
-        cur.close()
-        conn.close()
-        
+                if updated_bot:
+                    return {
+                        'statusCode': 200,
+                        'headers': cors_headers,
+                        'isBase64Encoded': False,
+                        'body': dumps({'bot': updated_bot})
+                    }
+                else:
+                    return {
+                        'statusCode': 404,
+                        'headers': cors_headers,
+                        'isBase64Encoded': False,
+                        'body': dumps({'error': 'Bot not found'})
+                    }
+    
     except Exception as e:
         return safe_error_response(e, context)
     
@@ -290,5 +564,5 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'statusCode': 405,
         'headers': cors_headers,
         'isBase64Encoded': False,
-        'body': json.dumps({'error': 'Method not allowed'})
+        'body': dumps({'error': 'Method not allowed'})
     }
\ No newline at end of file
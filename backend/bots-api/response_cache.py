@@ -0,0 +1,89 @@
+"""
+Conditional GET support and a warm-container cache of bots-api reads.
+ETags are strong and derived from the row versions (id, config_version,
+updated_at) behind a response, so they change whenever a bot changes.
+Rendered GET responses are kept for a few seconds keyed by the query
+string; POST and PUT clear the cache of the container that handled them,
+other containers serve their copy until it expires.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+RESPONSE_TTL_SECONDS = float(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '5'))
+MAX_ENTRIES = 512
+
+PUBLIC_CACHE_CONTROL = f'public, max-age={int(RESPONSE_TTL_SECONDS)}, must-revalidate'
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+
+Key = Tuple[Tuple[str, str], ...]
+Cached = Tuple[str, str, str]
+Version = Tuple[Any, Any, Any]
+
+
+def cache_key(params: Dict[str, str]) -> Key:
+    return tuple(sorted(params.items()))
+
+
+def make_etag(kind: str, key: Key, versions: Iterable[Version]) -> str:
+    """Strong ETag of a response built for the given query from rows with these versions"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{kind}|{key!r}'.encode('utf-8'))
+    for bot_id, config_version, updated_at in versions:
+        digest.update(f"|{bot_id}.{config_version}.{updated_at.isoformat() if updated_at else ''}".encode('utf-8'))
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check; uses weak comparison as RFC 9110 requires for it"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """LRU of query key -> (etag, body, cache_control, expires_at)"""
+
+    def __init__(self, ttl: float = RESPONSE_TTL_SECONDS, max_entries: int = MAX_ENTRIES) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[Key, tuple]' = OrderedDict()
+        self.stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        self._lock = threading.Lock()
+
+    def get(self, key: Key) -> Optional[Cached]:
+        """(etag, body, cache_control) if a fresh copy is cached"""
+        with self._lock:
+            cached = self.entries.get(key)
+            if cached is None or time.monotonic() >= cached[3]:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return cached[:3]
+
+    def put(self, key: Key, etag: str, body: str, cache_control: str) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self.entries[key] = (etag, body, cache_control, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self.stats['invalidations'] += 1
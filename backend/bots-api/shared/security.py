@@ -0,0 +1,316 @@
+# Vendored from backend/shared/security.py by backend/shared/vendor.py - do not edit
+"""
+Модуль безопасности для backend функций
+Включает валидацию, санитизацию, rate limiting, аутентификацию
+"""
+
+import re
+import json
+from typing import Dict, Any, Callable, List, Optional, Tuple, Union
+
+from shared import rate_limit
+
+RATE_LIMIT = 60
+RATE_WINDOW = 60
+
+# Регулярные выражения компилируются один раз при импорте
+# Всё, что меняет sanitize_input: символ html.escape или управляющий, а после
+# "<" и весь тег до ">". Начинается с класса символов, чтобы поиск шёл быстро
+_SANITIZE_RE = re.compile(r'[<>&"\'\x00-\x08\x0b-\x0c\x0e-\x1f\x7f](?:(?<=<)[^>]*>)?')
+# Замены html.escape; теги и управляющие символы удаляются
+_SANITIZE_REPLACEMENTS = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'}
+_UUID_RE = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$')
+_TELEGRAM_TOKEN_RE = re.compile(r'^\d{8,10}:[A-Za-z0-9_-]{35}$')
+_URL_RE = re.compile(r'^https?://[a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)*(/.*)?$')
+
+ALLOWED_ORIGINS = [
+    'https://poehali.dev',
+    'https://www.poehali.dev',
+    'http://localhost:5173',
+    'http://localhost:3000'
+]
+
+def get_cors_headers(event: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Безопасные CORS заголовки с whitelist доменов
+    """
+    origin = event.get('headers', {}).get('Origin', '')
+    
+    if origin in ALLOWED_ORIGINS:
+        cors_origin = origin
+    else:
+        cors_origin = ALLOWED_ORIGINS[0]
+    
+    return {
+        'Access-Control-Allow-Origin': cors_origin,
+        'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token, X-Session-Id',
+        'Access-Control-Max-Age': '86400',
+        'Access-Control-Allow-Credentials': 'true',
+        'Content-Type': 'application/json'
+    }
+
+def check_rate_limit(ip_address: str, limit: int = RATE_LIMIT, window: int = RATE_WINDOW) -> bool:
+    """
+    Проверка rate limiting по IP адресу (GCRA, см. shared/rate_limit.py)
+    
+    Args:
+        ip_address: IP адрес клиента
+        limit: Максимум запросов в окне
+        window: Окно времени в секундах
+        
+    Returns:
+        True если лимит не превышен, False иначе
+    """
+    return rate_limit.check_rate_limit(ip_address, limit, window)
+
+def _sanitize_match(match: 're.Match', get=_SANITIZE_REPLACEMENTS.get) -> str:
+    return get(match[0], '')
+
+def _sanitize_clipped(text: str) -> str:
+    """
+    Чистка уже обрезанной строки за один проход: удаление тегов,
+    экранирование и удаление управляющих символов одной заменой
+    """
+    return _SANITIZE_RE.sub(_sanitize_match, text).strip()
+
+def sanitize_input(text: str, max_length: int = 1000) -> str:
+    """
+    Санитизация пользовательского ввода от XSS
+    
+    Args:
+        text: Входной текст
+        max_length: Максимальная длина
+        
+    Returns:
+        Очищенный текст
+    """
+    if not text:
+        return ''
+    
+    return _sanitize_clipped(str(text)[:max_length])
+
+def sanitize_many(texts: List[Any], max_length: int = 1000) -> List[str]:
+    """
+    Санитизация списка строк за один вызов, результат как у sanitize_input
+    для каждой; если во всём списке нет спецсимволов, проверка одна на всех
+    
+    Args:
+        texts: Входные тексты
+        max_length: Максимальная длина каждого
+        
+    Returns:
+        Очищенные тексты в том же порядке
+    """
+    clipped = [str(text)[:max_length] if text else '' for text in texts]
+    if _SANITIZE_RE.search(''.join(clipped)) is None:
+        return [text.strip() for text in clipped]
+    return [_sanitize_clipped(text) for text in clipped]
+
+FieldCheck = Callable[[Any], Optional[str]]
+
+
+def _compile_field(field: str, rules: Dict[str, Any]) -> FieldCheck:
+    """
+    Проверка одного поля: правила разобраны заранее, на запрос остаются
+    только сравнения; возвращает первую ошибку поля или None
+    """
+    required = bool(rules.get('required'))
+    expected_type = rules.get('type')
+    required_error = f'{field} is required'
+    type_error = f'{field} must be {expected_type.__name__}' if expected_type else ''
+
+    max_len = rules.get('max_len')
+    min_len = rules.get('min_len')
+    pattern = re.compile(rules['pattern']) if 'pattern' in rules else None
+    minimum = rules.get('min')
+    maximum = rules.get('max')
+    has_str_rules = max_len is not None or min_len is not None or pattern is not None
+    has_number_rules = minimum is not None or maximum is not None
+
+    max_len_error = f'{field} exceeds max length {max_len}'
+    min_len_error = f'{field} is too short (min {min_len})'
+    pattern_error = f'{field} format is invalid'
+    minimum_error = f'{field} must be >= {minimum}'
+    maximum_error = f'{field} must be <= {maximum}'
+
+    def check(value: Any) -> Optional[str]:
+        if not value:
+            if required:
+                return required_error
+            if value is None:
+                return None
+        if expected_type is not None and not isinstance(value, expected_type):
+            return type_error
+        if has_str_rules and isinstance(value, str):
+            if max_len is not None and len(value) > max_len:
+                return max_len_error
+            if min_len is not None and len(value) < min_len:
+                return min_len_error
+            if pattern is not None and pattern.match(value) is None:
+                return pattern_error
+        elif has_number_rules and isinstance(value, (int, float)):
+            if minimum is not None and value < minimum:
+                return minimum_error
+            if maximum is not None and value > maximum:
+                return maximum_error
+        return None
+
+    return check
+
+
+class CompiledSchema:
+    """
+    Схема validate_input, скомпилированная в проверки полей
+
+    Вызов возвращает список ошибок, как validate_input, по одной на поле.
+    """
+
+    __slots__ = ('schema', 'checks')
+
+    def __init__(self, schema: Dict[str, Dict[str, Any]]) -> None:
+        self.schema = schema
+        self.checks: List[Tuple[str, FieldCheck]] = [
+            (field, _compile_field(field, rules)) for field, rules in schema.items()
+        ]
+
+    def __call__(self, data: Dict[str, Any]) -> List[str]:
+        errors = []
+        for field, check in self.checks:
+            error = check(data.get(field))
+            if error is not None:
+                errors.append(error)
+        return errors
+
+
+def compile_schema(schema: Dict[str, Dict[str, Any]]) -> CompiledSchema:
+    """
+    Компиляция схемы validate_input один раз при импорте функции
+
+    Args:
+        schema: Схема в формате validate_input
+
+    Returns:
+        Валидатор: validator(data) -> список ошибок
+    """
+    return CompiledSchema(schema)
+
+
+def validate_input(data: Dict[str, Any], schema: Union[Dict[str, Dict[str, Any]], CompiledSchema]) -> List[str]:
+    """
+    Валидация входных данных по схеме
+    
+    Args:
+        data: Данные для валидации
+        schema: Схема валидации или результат compile_schema
+        
+    Returns:
+        Список ошибок, первая ошибка каждого поля (пустой если всё ок)
+        
+    Example:
+        schema = {
+            'name': {'type': str, 'max_len': 100, 'required': True},
+            'email': {'type': str, 'pattern': r'^[^@]+@[^@]+\.[^@]+$'},
+            'age': {'type': int, 'min': 0, 'max': 150}
+        }
+    """
+    if not isinstance(schema, CompiledSchema):
+        schema = CompiledSchema(schema)
+    return schema(data)
+
+def escape_sql_param(param: Any) -> str:
+    """
+    Безопасное экранирование SQL параметров для Simple Query Protocol
+    
+    Args:
+        param: Параметр для экранирования
+        
+    Returns:
+        Экранированная строка
+    """
+    if param is None:
+        return 'NULL'
+    
+    if isinstance(param, bool):
+        return 'TRUE' if param else 'FALSE'
+    
+    if isinstance(param, (int, float)):
+        return str(param)
+    
+    param_str = str(param)
+    param_str = param_str.replace("'", "''")
+    
+    return f"'{param_str}'"
+
+def validate_uuid(uuid_str: str) -> bool:
+    """
+    Проверка валидности UUID
+    
+    Args:
+        uuid_str: Строка UUID
+        
+    Returns:
+        True если валидный UUID
+    """
+    return bool(_UUID_RE.match(str(uuid_str).lower()))
+
+def safe_error_response(error: Exception, context: Any) -> Dict[str, Any]:
+    """
+    Безопасный ответ с ошибкой без утечки деталей
+    
+    Args:
+        error: Exception объект
+        context: Cloud function context
+        
+    Returns:
+        Безопасный ответ для клиента
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+    
+    logger.error(f"Error in {getattr(context, 'function_name', 'unknown')}: {str(error)}", exc_info=True)
+    
+    return {
+        'statusCode': 500,
+        'headers': {'Content-Type': 'application/json'},
+        'body': json.dumps({
+            'error': 'Internal server error',
+            'request_id': getattr(context, 'request_id', 'unknown')
+        })
+    }
+
+def validate_telegram_token(token: str) -> bool:
+    """
+    Валидация формата Telegram Bot токена
+    
+    Args:
+        token: Telegram токен
+        
+    Returns:
+        True если формат корректный
+    """
+    return bool(_TELEGRAM_TOKEN_RE.match(token))
+
+def validate_url(url: str) -> bool:
+    """
+    Валидация URL
+    
+    Args:
+        url: URL для проверки
+        
+    Returns:
+        True если валидный URL
+    """
+    return bool(_URL_RE.match(url))
+
+def extract_ip(event: Dict[str, Any]) -> str:
+    """
+    Извлечение IP адреса из события
+    
+    Args:
+        event: Cloud function event
+        
+    Returns:
+        IP адрес клиента
+    """
+    return event.get('requestContext', {}).get('identity', {}).get('sourceIp', 'unknown')
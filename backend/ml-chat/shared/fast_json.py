@@ -0,0 +1,78 @@
+# Vendored from backend/shared/fast_json.py by backend/shared/vendor.py - do not edit
+"""
+Сериализация JSON для ответов функций
+Если в функции установлен orjson, используется он, иначе стандартный json
+с теми же правилами: компактный вывод, UTF-8 без \\u-экранирования,
+datetime/date/time в ISO 8601, Decimal числом, UUID строкой. Строки
+курсора без RealDictCursor превращаются в объекты через records
+"""
+
+import json
+from datetime import date, datetime, time
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+
+    # decimal и uuid импортируются только здесь, чтобы не удлинять холодный старт
+    from decimal import Decimal
+    from uuid import UUID
+
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+_encode = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(',', ':')).encode
+
+
+def stdlib_dumps(value: Any) -> str:
+    """
+    Сериализация стандартным json
+
+    Args:
+        value: Данные ответа
+
+    Returns:
+        JSON строка
+    """
+    return _encode(value)
+
+
+def orjson_dumps(value: Any) -> str:
+    """Сериализация через orjson; datetime, date и UUID он кодирует сам"""
+    return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+
+dumps = orjson_dumps if orjson is not None else stdlib_dumps
+
+
+def records(columns: Sequence[str], rows: Sequence[Sequence[Any]], fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Строки обычного курсора в список объектов для ответа
+
+    Args:
+        columns: Имена колонок в порядке SELECT (например, из cursor.description)
+        rows: Кортежи строк
+        fields: Какие колонки оставить и в каком порядке, по умолчанию все
+
+    Returns:
+        Список словарей колонка -> значение
+    """
+    if fields is None or list(fields) == list(columns):
+        return [dict(zip(columns, row)) for row in rows]
+    if len(fields) == 1:
+        index = list(columns).index(fields[0])
+        return [{fields[0]: row[index]} for row in rows]
+    pick = itemgetter(*[list(columns).index(field) for field in fields])
+    return [dict(zip(fields, pick(row))) for row in rows]
@@ -0,0 +1,83 @@
+# Vendored from backend/shared/training_cache.py by backend/shared/vendor.py - do not edit
+"""
+Warm-container LRU cache of per-bot training indexes with a byte budget.
+Entries carry the (row count, max id, max updated_at) version they were
+built from, so a request can revalidate with one aggregate query instead
+of refetching the training set.
+"""
+
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from shared.tfidf_index import TfidfIndex
+
+Version = Tuple[int, Optional[int], Optional[str]]
+
+CACHE_MAX_BYTES = int(os.environ.get('ML_CHAT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+REVALIDATE_SECONDS = float(os.environ.get('ML_CHAT_REVALIDATE_SECONDS', '1'))
+
+POSTING_BYTES = 120
+
+
+def estimate_bytes(index: TfidfIndex) -> int:
+    """Rough memory footprint of an index: texts plus one posting per term"""
+    text_bytes = sum(sys.getsizeof(q) + sys.getsizeof(a) for q, a in zip(index.questions, index.answers))
+    postings = sum(len(vector) for vector in index.doc_vectors)
+    return text_bytes + postings * POSTING_BYTES
+
+
+class CacheEntry:
+    __slots__ = ('index', 'version', 'size', 'checked_at')
+
+    def __init__(self, index: TfidfIndex, version: Version) -> None:
+        self.index = index
+        self.version = version
+        self.size = estimate_bytes(index)
+        self.checked_at = time.monotonic()
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() - self.checked_at < REVALIDATE_SECONDS
+
+
+class TrainingCache:
+    """LRU over bot keys, evicting least recently used entries past max_bytes"""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries: 'OrderedDict[Any, CacheEntry]' = OrderedDict()
+        self.stats: Dict[str, int] = {'hits': 0, 'revalidated': 0, 'appended': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key: Any) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Any, index: TfidfIndex, version: Version) -> CacheEntry:
+        self.discard(key)
+        entry = CacheEntry(index, version)
+        self.entries[key] = entry
+        self.total_bytes += entry.size
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted.size
+            self.stats['evictions'] += 1
+        return entry
+
+    def resize(self, key: Any) -> None:
+        """Re-estimate an entry after rows were appended to its index in place"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.total_bytes -= entry.size
+            entry.size = estimate_bytes(entry.index)
+            self.total_bytes += entry.size
+
+    def discard(self, key: Any) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
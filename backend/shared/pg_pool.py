@@ -0,0 +1,117 @@
+"""
+Пул соединений psycopg2 между вызовами тёплого контейнера
+Соединение берётся через контекстный менеджер и всегда возвращается в пул
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+MAX_IDLE_CONNECTIONS = 2
+HEALTHCHECK_AFTER = 30.0
+CONNECT_TIMEOUT = 5
+
+_idle: Dict[str, List[Tuple[psycopg2.extensions.connection, float]]] = {}
+
+pool_stats: Dict[str, int] = {
+    'hits': 0,
+    'misses': 0,
+    'reconnects': 0,
+    'discarded': 0
+}
+
+_BROKEN_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+def _is_healthy(conn: psycopg2.extensions.connection, idle_for: float) -> bool:
+    if conn.closed:
+        return False
+    if idle_for < HEALTHCHECK_AFTER:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def acquire(db_url: str) -> psycopg2.extensions.connection:
+    """
+    Соединение из пула или новое, если свободных живых нет
+
+    Args:
+        db_url: DATABASE_URL
+
+    Returns:
+        Открытое соединение psycopg2
+    """
+    idle = _idle.setdefault(db_url, [])
+    while idle:
+        conn, released_at = idle.pop()
+        if _is_healthy(conn, time.monotonic() - released_at):
+            pool_stats['hits'] += 1
+            return conn
+        pool_stats['reconnects'] += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    pool_stats['misses'] += 1
+    return psycopg2.connect(db_url, connect_timeout=CONNECT_TIMEOUT)
+
+
+def release(db_url: str, conn: psycopg2.extensions.connection, broken: bool = False) -> None:
+    """
+    Возврат соединения в пул; незавершённая транзакция откатывается
+
+    Args:
+        db_url: DATABASE_URL
+        conn: Соединение из acquire
+        broken: Соединение нужно закрыть, а не переиспользовать
+    """
+    idle = _idle.setdefault(db_url, [])
+    if not broken and not conn.closed:
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            broken = True
+
+    if broken or conn.closed or len(idle) >= MAX_IDLE_CONNECTIONS:
+        pool_stats['discarded'] += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        return
+
+    idle.append((conn, time.monotonic()))
+
+
+@contextmanager
+def get_connection(db_url: str) -> Iterator[psycopg2.extensions.connection]:
+    """
+    Соединение на время блока with
+
+    Коммит остаётся за вызывающим кодом. При выходе без коммита
+    транзакция откатывается, соединение с сетевой ошибкой закрывается,
+    остальные возвращаются в пул, в том числе при раннем return.
+
+    Args:
+        db_url: DATABASE_URL
+    """
+    conn = acquire(db_url)
+    broken = False
+    try:
+        yield conn
+    except _BROKEN_ERRORS:
+        broken = True
+        raise
+    finally:
+        release(db_url, conn, broken or bool(conn.closed))
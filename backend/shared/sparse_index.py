@@ -0,0 +1,111 @@
+"""
+CSR sparse-matrix scoring backend for TfidfIndex.
+NumPy and SciPy are not in the functions' requirements: add them to
+ml-chat or telegram-webhook to enable this backend. They are imported
+lazily and only when a corpus is large enough to benefit; without them
+every bot stays on the pure Python index.
+"""
+
+import os
+from typing import Dict, List, Optional, Tuple, Type
+
+from shared.tfidf_index import TfidfIndex
+
+# Below this the pure Python index is faster (benchmarks/ml_chat_scoring.py)
+SPARSE_MIN_ROWS = 5000
+
+_np = None
+_sp = None
+_available: Optional[bool] = None
+
+
+def sparse_available() -> bool:
+    """True if NumPy and SciPy can be imported"""
+    global _np, _sp, _available
+    if _available is None:
+        try:
+            import numpy
+            import scipy.sparse
+        except ImportError:
+            _available = False
+        else:
+            _np, _sp = numpy, scipy.sparse
+            _available = True
+    return _available
+
+
+def index_class(num_rows: int) -> Type[TfidfIndex]:
+    """
+    Pick the scoring backend from ML_CHAT_BACKEND: 'python', 'numpy'
+    or 'auto' (default, numpy from SPARSE_MIN_ROWS rows on)
+    """
+    backend = os.environ.get('ML_CHAT_BACKEND', 'auto')
+    if backend == 'python':
+        return TfidfIndex
+    if (backend == 'numpy' or num_rows >= SPARSE_MIN_ROWS) and sparse_available():
+        return SparseTfidfIndex
+    return TfidfIndex
+
+
+class SparseTfidfIndex(TfidfIndex):
+    """
+    Same index, scored as one sparse mat-vec over the L2-normalized
+    document rows. The matrix is kept column-compressed so a query only
+    multiplies the columns of its own terms. Rows added incrementally
+    are stacked onto the matrix on the next search; a refresh rebuilds it.
+    """
+
+    def __init__(self, base: Optional[TfidfIndex] = None) -> None:
+        if not sparse_available():
+            raise ImportError('SparseTfidfIndex requires numpy and scipy')
+        super().__init__(base)
+        self.columns: Dict[str, int] = {}
+        self._matrix = None
+        self._matrix_rows = 0
+
+    def refresh(self) -> None:
+        super().refresh()
+        self._matrix = None
+        self._matrix_rows = 0
+
+    def _build_rows(self, start: int, end: int):
+        indptr = [0]
+        indices: List[int] = []
+        data: List[float] = []
+        for doc in range(start, end):
+            for word, weight in self.doc_vectors[doc].items():
+                indices.append(self.columns.setdefault(word, len(self.columns)))
+                data.append(weight)
+            indptr.append(len(indices))
+        return _sp.csr_matrix(
+            (_np.array(data, dtype=_np.float64), _np.array(indices, dtype=_np.int32), _np.array(indptr, dtype=_np.int64)),
+            shape=(end - start, len(self.columns))
+        )
+
+    def matrix(self):
+        num_rows = len(self.row_ids)
+        if self._matrix is None:
+            self._matrix = self._build_rows(0, num_rows).tocsc()
+        elif self._matrix_rows < num_rows:
+            tail = self._build_rows(self._matrix_rows, num_rows)
+            self._matrix.resize((self._matrix_rows, len(self.columns)))
+            self._matrix = _sp.vstack([self._matrix, tail], format='csc')
+        self._matrix_rows = num_rows
+        return self._matrix
+
+    def search_vector(self, query_vector: Dict[str, float], k: int, threshold: float) -> List[Tuple[float, int]]:
+        matrix = self.matrix()
+        terms = [(self.columns[word], weight) for word, weight in query_vector.items() if word in self.columns]
+        if not terms:
+            return []
+
+        columns = [column for column, _ in terms]
+        scores = matrix[:, columns] @ _np.array([weight for _, weight in terms], dtype=_np.float64)
+
+        candidates = _np.flatnonzero((scores > 0) & (scores >= threshold))
+        if len(candidates) > k:
+            candidate_scores = scores[candidates]
+            kth = _np.partition(candidate_scores, len(candidates) - k)[len(candidates) - k]
+            candidates = candidates[candidate_scores >= kth]
+        order = _np.lexsort((candidates, -scores[candidates]))[:k]
+        return [(float(scores[doc]), int(doc)) for doc in candidates[order]]
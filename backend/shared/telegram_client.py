@@ -0,0 +1,250 @@
+"""
+Клиент Telegram Bot API
+Держит keep-alive соединения к api.telegram.org между вызовами тёплого
+контейнера, ограничивает время каждого запроса и соблюдает лимиты
+Telegram: 1 сообщение в секунду в чат и 30 в секунду на бота, повторяя
+ответы 429 после retry_after
+"""
+
+import http.client
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+API_BASE = os.environ.get('TELEGRAM_API_BASE', 'https://api.telegram.org')
+DEFAULT_TIMEOUT = 5.0
+# Не меньше числа потоков рассылки telegram-bot, иначе лишние потоки
+# открывают новое TLS-соединение на каждую отправку
+MAX_IDLE_CONNECTIONS = 8
+MAX_RETRIES = 3
+MAX_RETRY_AFTER = 30.0
+
+PER_CHAT_RATE = 1.0
+GLOBAL_RATE = 30.0
+MAX_TRACKED_CHATS = 10000
+
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionError, BrokenPipeError)
+
+
+class TelegramError(Exception):
+    """Запрос к Telegram не выполнен: сеть, таймаут или неразборчивый ответ"""
+
+
+class TokenBucket:
+    """
+    Потокобезопасный token bucket с резервированием
+
+    reserve() сразу списывает токен и возвращает, сколько подождать до
+    него, поэтому параллельные отправители встают в очередь, а не гонятся.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены seconds секунд (после 429)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class RateLimiter:
+    """Лимиты Telegram на бота: общий и на каждый чат"""
+
+    def __init__(
+        self,
+        global_rate: float = GLOBAL_RATE,
+        per_chat_rate: float = PER_CHAT_RATE,
+        max_chats: int = MAX_TRACKED_CHATS
+    ) -> None:
+        self.global_rate = global_rate
+        self.per_chat_rate = per_chat_rate
+        self.max_chats = max_chats
+        self._buckets: 'OrderedDict[Tuple[str, Any], TokenBucket]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: Tuple[str, Any], rate: float) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, max(rate, 1.0))
+                while len(self._buckets) > self.max_chats:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def delay(self, bot_token: str, chat_id: Any = None) -> float:
+        """Резервирует отправку и возвращает, сколько секунд до неё подождать"""
+        wait = self._bucket((bot_token, None), self.global_rate).reserve()
+        if chat_id is not None:
+            wait = max(wait, self._bucket((bot_token, str(chat_id)), self.per_chat_rate).reserve())
+        return wait
+
+    def pause(self, bot_token: str, seconds: float) -> None:
+        self._bucket((bot_token, None), self.global_rate).pause(seconds)
+
+
+class TelegramClient:
+    """
+    Вызовы Bot API через пул keep-alive соединений
+
+    Args:
+        api_base: Адрес API, например http://127.0.0.1:8081 для локальной заглушки
+        timeout: Таймаут на соединение и чтение в секундах
+        limiter: Лимитер отправки сообщений, None - без ограничений
+        max_retries: Сколько раз повторять ответ 429
+        sleep: Функция ожидания (подменяется в тестах)
+        max_idle: Сколько keep-alive соединений держать между вызовами
+    """
+
+    def __init__(
+        self,
+        api_base: str = API_BASE,
+        timeout: float = DEFAULT_TIMEOUT,
+        limiter: Optional[RateLimiter] = None,
+        max_retries: int = MAX_RETRIES,
+        sleep: Callable[[float], None] = time.sleep,
+        max_idle: int = MAX_IDLE_CONNECTIONS
+    ) -> None:
+        parts = urlsplit(api_base)
+        self.secure = parts.scheme == 'https'
+        self.host = parts.hostname or 'api.telegram.org'
+        self.port = parts.port or (443 if self.secure else 80)
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self.max_idle = max_idle
+        self.stats: Dict[str, int] = {'requests': 0, 'reused': 0, 'rate_limited': 0, 'errors': 0}
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                self.stats['reused'] += 1
+                return self._idle.pop(), True
+        connection_class = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout), False
+
+    def _release(self, conn: http.client.HTTPConnection, response: http.client.HTTPResponse) -> None:
+        with self._lock:
+            if not response.will_close and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _post(self, path: str, body: bytes) -> Tuple[int, bytes]:
+        headers = {'Content-Type': 'application/json'}
+        while True:
+            conn, reused = self._acquire()
+            try:
+                conn.request('POST', path, body=body, headers=headers)
+                response = conn.getresponse()
+                payload = response.read()
+            except _STALE_ERRORS as e:
+                conn.close()
+                if reused:
+                    continue
+                raise TelegramError(str(e)) from e
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise TelegramError(str(e)) from e
+
+            self._release(conn, response)
+            return response.status, payload
+
+    def call(self, bot_token: str, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Вызов метода Bot API
+
+        На 429 ждёт retry_after (не дольше MAX_RETRY_AFTER) и повторяет
+        до max_retries раз.
+
+        Args:
+            bot_token: Токен бота
+            method: Метод API, например sendMessage
+            params: Параметры метода
+
+        Returns:
+            Ответ Telegram: {'ok': True, 'result': ...} или {'ok': False, 'error_code': ..., 'description': ...}
+
+        Raises:
+            TelegramError: сетевая ошибка, таймаут или ответ не в JSON
+        """
+        path = f'{self.prefix}/bot{bot_token}/{method}'
+        body = json.dumps(params or {}).encode('utf-8')
+        attempt = 0
+        while True:
+            self.stats['requests'] += 1
+            try:
+                status, payload = self._post(path, body)
+                result = json.loads(payload.decode('utf-8'))
+            except TelegramError:
+                self.stats['errors'] += 1
+                raise
+            except ValueError as e:
+                self.stats['errors'] += 1
+                raise TelegramError(f'invalid response from Telegram: {e}') from e
+
+            if status != 429:
+                return result
+
+            self.stats['rate_limited'] += 1
+            retry_after = float((result.get('parameters') or {}).get('retry_after', 1))
+            if attempt >= self.max_retries or retry_after > MAX_RETRY_AFTER:
+                return result
+            attempt += 1
+            if self.limiter is not None:
+                self.limiter.pause(bot_token, retry_after)
+            self.sleep(retry_after)
+
+    def send_message(self, bot_token: str, chat_id: Any, text: str, **options: Any) -> Dict[str, Any]:
+        """
+        sendMessage с учётом лимитов Telegram
+
+        Args:
+            bot_token: Токен бота
+            chat_id: Чат получателя
+            text: Текст сообщения
+            options: Прочие параметры sendMessage, например parse_mode
+
+        Returns:
+            Ответ Telegram
+        """
+        if self.limiter is not None:
+            wait = self.limiter.delay(bot_token, chat_id)
+            if wait > 0:
+                self.sleep(wait)
+        return self.call(bot_token, 'sendMessage', {'chat_id': chat_id, 'text': text, **options})
+
+
+_client: Optional[TelegramClient] = None
+
+
+def get_client() -> TelegramClient:
+    """Общий клиент контейнера с лимитером по умолчанию"""
+    global _client
+    if _client is None:
+        _client = TelegramClient(limiter=RateLimiter())
+    return _client
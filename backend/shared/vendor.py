@@ -0,0 +1,68 @@
+"""
+Копирование модулей backend/shared в каталоги функций
+
+Каждая функция деплоится из своего каталога, поэтому общий код
+лежит в <функция>/shared/ как копия. Править нужно оригинал
+в backend/shared и запускать скрипт:
+
+    python backend/shared/vendor.py          # обновить копии
+    python backend/shared/vendor.py --check  # проверить, что копии актуальны
+"""
+
+import os
+import sys
+from typing import Dict, List
+
+SHARED_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SHARED_DIR)
+
+VENDORED: Dict[str, List[str]] = {
+    'ai-tools': ['db_proxy', 'fast_json', 'rate_limit', 'security'],
+    'bots-api': ['pg_pool', 'fast_json', 'rate_limit', 'security'],
+    'ml-chat': ['db_proxy', 'fast_json', 'tfidf_index', 'sparse_index', 'training_cache', 'matcher'],
+    'telegram-bot': ['pg_pool', 'fast_json', 'telegram_client'],
+    'telegram-webhook': ['pg_pool', 'fast_json', 'tfidf_index', 'sparse_index', 'training_cache', 'matcher', 'telegram_client'],
+}
+
+HEADER = '# Vendored from backend/shared/{name}.py by backend/shared/vendor.py - do not edit\n'
+
+
+def vendored_files() -> Dict[str, str]:
+    """
+    Ожидаемое содержимое всех копий
+
+    Returns:
+        Словарь путь -> содержимое файла
+    """
+    files = {}
+    for function, modules in VENDORED.items():
+        target = os.path.join(BACKEND_DIR, function, 'shared')
+        files[os.path.join(target, '__init__.py')] = ''
+        for name in modules:
+            with open(os.path.join(SHARED_DIR, f'{name}.py'), encoding='utf-8') as source:
+                files[os.path.join(target, f'{name}.py')] = HEADER.format(name=name) + source.read()
+    return files
+
+
+def main(check: bool) -> int:
+    stale = []
+    for path, content in vendored_files().items():
+        current = None
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as existing:
+                current = existing.read()
+        if current == content:
+            continue
+        stale.append(os.path.relpath(path, BACKEND_DIR))
+        if not check:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as target:
+                target.write(content)
+
+    for path in stale:
+        print(('stale: ' if check else 'updated: ') + path)
+    return 1 if check and stale else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main('--check' in sys.argv[1:]))
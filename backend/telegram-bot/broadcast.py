@@ -0,0 +1,212 @@
+"""
+Bulk broadcast for telegram-bot.
+The audience is materialized once into broadcast_recipients. Each call then
+claims pending recipients in chunks under a lease, commits the claim, sends
+the chunk through a thread pool that shares the Telegram client's rate
+limiter, and commits the chunk's outcomes before the next one. Claims skip
+rows locked or leased by another call, so a retry that overlaps a running
+call sends to different recipients. A call that runs out of time budget
+returns 'in_progress'; calling again with the broadcast_id resumes from
+the remaining recipients, including chunks whose lease expired.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from shared.pg_pool import get_connection
+from shared.telegram_client import TelegramClient, TelegramError
+
+WORKERS = 8
+CHUNK_SIZE = 200
+TIME_BUDGET_SECONDS = 20.0
+LEASE_SECONDS = 120
+MAX_CHAT_IDS = 100000
+
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+STATUS_BLOCKED = 'blocked'
+STATUS_SENDING = 'sending'
+
+Outcome = Tuple[int, str, Optional[str]]
+
+
+def classify(chat_id: int, result: Dict[str, Any]) -> Outcome:
+    """Outcome of one sendMessage: 403 means the user blocked the bot or left the chat"""
+    if result.get('ok'):
+        return chat_id, STATUS_SENT, None
+    status = STATUS_BLOCKED if result.get('error_code') == 403 else STATUS_FAILED
+    return chat_id, status, str(result.get('description', ''))[:500]
+
+
+def send_one(client: TelegramClient, bot_token: str, text: str, chat_id: int) -> Outcome:
+    try:
+        return classify(chat_id, client.send_message(bot_token, chat_id, text, parse_mode='HTML'))
+    except TelegramError as e:
+        return chat_id, STATUS_FAILED, str(e)[:500]
+
+
+def create_broadcast(
+    db_url: str,
+    bot_id: int,
+    text: str,
+    chat_ids: Optional[Sequence[int]] = None,
+    since_days: Optional[int] = None
+) -> int:
+    """
+    Store a broadcast and its audience: the given chat ids, or every user
+    who wrote to the bot (optionally within the last since_days days)
+    """
+    with get_connection(db_url) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "INSERT INTO broadcasts (bot_id, message_text) VALUES (%s, %s) RETURNING id",
+            (bot_id, text)
+        )
+        broadcast_id = cur.fetchone()['id']
+
+        if chat_ids is not None:
+            execute_values(
+                cur,
+                "INSERT INTO broadcast_recipients (broadcast_id, chat_id) VALUES %s ON CONFLICT DO NOTHING",
+                [(broadcast_id, chat_id) for chat_id in chat_ids],
+                page_size=1000
+            )
+        else:
+            since = "AND created_at >= CURRENT_TIMESTAMP - make_interval(days => %s)" if since_days else ""
+            cur.execute(
+                f"""
+                INSERT INTO broadcast_recipients (broadcast_id, chat_id)
+                SELECT DISTINCT %s, user_id FROM messages WHERE bot_id = %s {since}
+                """,
+                (broadcast_id, bot_id) + ((since_days,) if since_days else ())
+            )
+
+        cur.execute(
+            """
+            UPDATE broadcasts SET total = (SELECT COUNT(*) FROM broadcast_recipients WHERE broadcast_id = %s)
+            WHERE id = %s
+            """,
+            (broadcast_id, broadcast_id)
+        )
+        conn.commit()
+    return broadcast_id
+
+
+def claim_chunk(cur, broadcast_id: int, chunk_size: int, lease: float = LEASE_SECONDS) -> List[int]:
+    """
+    Lease the next pending recipients (or ones whose lease expired) to this
+    call; the caller commits right away so the sends run outside a transaction
+    """
+    cur.execute(
+        """
+        UPDATE broadcast_recipients r
+        SET status = 'sending', lease_until = CURRENT_TIMESTAMP + make_interval(secs => %s)
+        WHERE r.broadcast_id = %s AND r.chat_id IN (
+            SELECT chat_id FROM broadcast_recipients
+            WHERE broadcast_id = %s
+              AND (status = 'pending' OR (status = 'sending' AND lease_until < CURRENT_TIMESTAMP))
+            ORDER BY chat_id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING r.chat_id
+        """,
+        (lease, broadcast_id, broadcast_id, chunk_size)
+    )
+    return sorted(row['chat_id'] for row in cur.fetchall())
+
+
+def save_outcomes(cur, broadcast_id: int, outcomes: List[Outcome]) -> None:
+    """Checkpoint one chunk: recipient statuses and broadcast counters in one statement"""
+    execute_values(
+        cur,
+        """
+        WITH outcome (chat_id, status, error) AS (VALUES %s),
+        marked AS (
+            UPDATE broadcast_recipients r SET status = o.status, error = o.error, lease_until = NULL
+            FROM outcome o
+            WHERE r.broadcast_id = {broadcast_id} AND r.chat_id = o.chat_id AND r.status = 'sending'
+            RETURNING r.status
+        )
+        UPDATE broadcasts SET
+            sent = sent + (SELECT COUNT(*) FROM marked WHERE status = 'sent'),
+            failed = failed + (SELECT COUNT(*) FROM marked WHERE status = 'failed'),
+            blocked = blocked + (SELECT COUNT(*) FROM marked WHERE status = 'blocked'),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = {broadcast_id}
+        """.format(broadcast_id=int(broadcast_id)),
+        outcomes,
+        template='(%s::bigint, %s, %s)',
+        page_size=len(outcomes)
+    )
+
+
+def run_broadcast(
+    db_url: str,
+    broadcast_id: int,
+    client: TelegramClient,
+    workers: int = WORKERS,
+    chunk_size: int = CHUNK_SIZE,
+    time_budget: float = TIME_BUDGET_SECONDS
+) -> Optional[Dict[str, Any]]:
+    """
+    Send pending recipients until done or the time budget is spent
+
+    Returns:
+        Progress report, None if the broadcast does not exist
+    """
+    started = time.monotonic()
+    processed = 0
+
+    with get_connection(db_url) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            """
+            SELECT b.message_text, bots.telegram_token FROM broadcasts b
+            JOIN bots ON bots.id = b.bot_id
+            WHERE b.id = %s
+            """,
+            (broadcast_id,)
+        )
+        broadcast = cur.fetchone()
+        conn.commit()
+        if broadcast is None:
+            return None
+
+        # Threads beyond the client's idle pool would reconnect on every send
+        with ThreadPoolExecutor(max_workers=min(workers, client.max_idle)) as pool:
+            while time.monotonic() - started < time_budget:
+                chat_ids = claim_chunk(cur, broadcast_id, chunk_size)
+                conn.commit()
+                if not chat_ids:
+                    break
+
+                outcomes = list(pool.map(
+                    lambda chat_id: send_one(client, broadcast['telegram_token'], broadcast['message_text'], chat_id),
+                    chat_ids
+                ))
+                save_outcomes(cur, broadcast_id, outcomes)
+                conn.commit()
+                processed += len(outcomes)
+
+        cur.execute(
+            """
+            UPDATE broadcasts SET
+                status = CASE WHEN sent + failed + blocked >= total THEN 'done' ELSE 'in_progress' END,
+                finished_at = CASE WHEN sent + failed + blocked >= total THEN CURRENT_TIMESTAMP END
+            WHERE id = %s
+            RETURNING id, status, total, sent, failed, blocked
+            """,
+            (broadcast_id,)
+        )
+        report = dict(cur.fetchone())
+        conn.commit()
+
+    elapsed = time.monotonic() - started
+    report['broadcast_id'] = report.pop('id')
+    report['pending'] = report['total'] - report['sent'] - report['failed'] - report['blocked']
+    report['processed'] = processed
+    report['elapsed_seconds'] = round(elapsed, 2)
+    report['messages_per_second'] = round(processed / elapsed, 2) if elapsed > 0 else 0.0
+    return report
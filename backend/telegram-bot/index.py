@@ -1,12 +1,67 @@
 import json
 import os
 from typing import Dict, Any
-import urllib.request
-import urllib.parse
+
+from broadcast import MAX_CHAT_IDS, create_broadcast, run_broadcast
+from shared.fast_json import dumps
+from shared.telegram_client import TelegramError, get_client
+
+MAX_MESSAGE_LENGTH = 4096
+
+
+def json_response(status_code: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'isBase64Encoded': False,
+        'body': dumps(payload)
+    }
+
+
+def handle_broadcast(body_data: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Start a broadcast ({bot_id, text, chat_ids | since_days}) or resume one ({broadcast_id})
+    and send for up to the time budget; returns the progress report
+    '''
+    db_url = os.environ.get('DATABASE_URL')
+    if not db_url:
+        return json_response(500, {'error': 'DATABASE_URL not configured'})
+    
+    broadcast_id = body_data.get('broadcast_id')
+    if broadcast_id is None:
+        bot_id = body_data.get('bot_id')
+        text = body_data.get('text')
+        chat_ids = body_data.get('chat_ids')
+        since_days = body_data.get('since_days')
+        
+        if not isinstance(bot_id, int) or isinstance(bot_id, bool) or not isinstance(text, str) or not text.strip():
+            return json_response(400, {'error': 'bot_id and text are required'})
+        if len(text) > MAX_MESSAGE_LENGTH:
+            return json_response(400, {'error': f'text exceeds {MAX_MESSAGE_LENGTH} characters'})
+        if chat_ids is not None and (
+            not isinstance(chat_ids, list) or len(chat_ids) > MAX_CHAT_IDS
+            or not all(isinstance(chat_id, int) and not isinstance(chat_id, bool) for chat_id in chat_ids)
+        ):
+            return json_response(400, {'error': f'chat_ids must be a list of up to {MAX_CHAT_IDS} integers'})
+        if since_days is not None and (not isinstance(since_days, int) or isinstance(since_days, bool) or since_days < 1):
+            return json_response(400, {'error': 'since_days must be a positive integer'})
+        
+        broadcast_id = create_broadcast(db_url, bot_id, text, chat_ids, since_days)
+    elif not isinstance(broadcast_id, int) or isinstance(broadcast_id, bool):
+        return json_response(400, {'error': 'broadcast_id must be an integer'})
+    
+    report = run_broadcast(db_url, broadcast_id, get_client())
+    if report is None:
+        return json_response(404, {'error': 'Broadcast not found'})
+    return json_response(200, {'success': True, 'broadcast': report})
+
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Business: Telegram Bot API integration - send messages, handle webhooks
+    Business: Telegram Bot API integration - send messages, broadcasts, handle webhooks
     Args: event - dict with httpMethod, body, queryStringParameters
           context - object with attributes: request_id, function_name
     Returns: HTTP response dict
@@ -25,6 +80,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': ''
         }
     
+    body_data = json.loads(event.get('body') or '{}') if method == 'POST' else {}
+    if body_data.get('action') == 'broadcast':
+        try:
+            return handle_broadcast(body_data)
+        except Exception as e:
+            return json_response(500, {'error': str(e)})
+    
     bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
     if not bot_token:
         return {
@@ -34,11 +96,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'Access-Control-Allow-Origin': '*'
             },
             'isBase64Encoded': False,
-            'body': json.dumps({'error': 'TELEGRAM_BOT_TOKEN not configured'})
+            'body': dumps({'error': 'TELEGRAM_BOT_TOKEN not configured'})
         }
     
     if method == 'POST':
-        body_data = json.loads(event.get('body', '{}'))
         action = body_data.get('action')
         
         if action == 'send_message':
@@ -53,35 +114,21 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'Access-Control-Allow-Origin': '*'
                     },
                     'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'chat_id and text are required'})
+                    'body': dumps({'error': 'chat_id and text are required'})
                 }
             
-            telegram_url = f'https://api.telegram.org/bot{bot_token}/sendMessage'
-            data = json.dumps({
-                'chat_id': chat_id,
-                'text': text,
-                'parse_mode': 'HTML'
-            }).encode('utf-8')
-            
-            req = urllib.request.Request(
-                telegram_url,
-                data=data,
-                headers={'Content-Type': 'application/json'}
-            )
-            
             try:
-                with urllib.request.urlopen(req) as response:
-                    result = json.loads(response.read().decode('utf-8'))
-                    return {
-                        'statusCode': 200,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*'
-                        },
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'success': True, 'result': result})
-                    }
-            except Exception as e:
+                result = get_client().send_message(bot_token, chat_id, text, parse_mode='HTML')
+                return {
+                    'statusCode': 200 if result.get('ok') else 502,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'isBase64Encoded': False,
+                    'body': dumps({'success': bool(result.get('ok')), 'result': result})
+                }
+            except TelegramError as e:
                 return {
                     'statusCode': 500,
                     'headers': {
@@ -89,25 +136,22 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'Access-Control-Allow-Origin': '*'
                     },
                     'isBase64Encoded': False,
-                    'body': json.dumps({'error': str(e)})
+                    'body': dumps({'error': str(e)})
                 }
         
         elif action == 'get_bot_info':
-            telegram_url = f'https://api.telegram.org/bot{bot_token}/getMe'
-            
             try:
-                with urllib.request.urlopen(telegram_url) as response:
-                    result = json.loads(response.read().decode('utf-8'))
-                    return {
-                        'statusCode': 200,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*'
-                        },
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'success': True, 'bot': result.get('result')})
-                    }
-            except Exception as e:
+                result = get_client().call(bot_token, 'getMe')
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'isBase64Encoded': False,
+                    'body': dumps({'success': True, 'bot': result.get('result')})
+                }
+            except TelegramError as e:
                 return {
                     'statusCode': 500,
                     'headers': {
@@ -115,7 +159,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'Access-Control-Allow-Origin': '*'
                     },
                     'isBase64Encoded': False,
-                    'body': json.dumps({'error': str(e)})
+                    'body': dumps({'error': str(e)})
                 }
         
         elif action == 'set_webhook':
@@ -128,31 +172,25 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'Access-Control-Allow-Origin': '*'
                     },
                     'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'webhook_url is required'})
+                    'body': dumps({'error': 'webhook_url is required'})
                 }
             
-            telegram_url = f'https://api.telegram.org/bot{bot_token}/setWebhook'
-            data = json.dumps({'url': webhook_url}).encode('utf-8')
-            
-            req = urllib.request.Request(
-                telegram_url,
-                data=data,
-                headers={'Content-Type': 'application/json'}
-            )
+            webhook_params = {'url': webhook_url}
+            if body_data.get('secret_token'):
+                webhook_params['secret_token'] = body_data['secret_token']
             
             try:
-                with urllib.request.urlopen(req) as response:
-                    result = json.loads(response.read().decode('utf-8'))
-                    return {
-                        'statusCode': 200,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*'
-                        },
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'success': True, 'result': result})
-                    }
-            except Exception as e:
+                result = get_client().call(bot_token, 'setWebhook', webhook_params)
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'isBase64Encoded': False,
+                    'body': dumps({'success': True, 'result': result})
+                }
+            except TelegramError as e:
                 return {
                     'statusCode': 500,
                     'headers': {
@@ -160,7 +198,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'Access-Control-Allow-Origin': '*'
                     },
                     'isBase64Encoded': False,
-                    'body': json.dumps({'error': str(e)})
+                    'body': dumps({'error': str(e)})
                 }
     
     return {
@@ -170,5 +208,5 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'Access-Control-Allow-Origin': '*'
         },
         'isBase64Encoded': False,
-        'body': json.dumps({'error': 'Method not allowed'})
+        'body': dumps({'error': 'Method not allowed'})
     }
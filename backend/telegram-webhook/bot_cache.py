@@ -0,0 +1,82 @@
+"""
+Warm-container cache of bot config resolved by Telegram token.
+A hit within the TTL costs no query; an expired entry is revalidated by
+primary key against bots.config_version, which bots-api bumps on every
+update, and only refetched when the version moved. Unknown or inactive
+tokens are cached as misses for a shorter TTL.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from psycopg2.extras import RealDictCursor
+
+from shared.pg_pool import get_connection
+
+BOT_TTL_SECONDS = float(os.environ.get('BOT_CACHE_TTL_SECONDS', '60'))
+NEGATIVE_TTL_SECONDS = float(os.environ.get('BOT_CACHE_NEGATIVE_TTL_SECONDS', '5'))
+MAX_ENTRIES = 1024
+
+BOT_COLUMNS = 'id, config_version'
+
+Bot = Dict[str, Any]
+
+
+class BotCache:
+    """LRU of token -> (bot or None, expires_at)"""
+
+    def __init__(
+        self,
+        ttl: float = BOT_TTL_SECONDS,
+        negative_ttl: float = NEGATIVE_TTL_SECONDS,
+        max_entries: int = MAX_ENTRIES
+    ) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.stats: Dict[str, int] = {'hits': 0, 'negative_hits': 0, 'revalidated': 0, 'misses': 0}
+
+    def _store(self, token: str, bot: Optional[Bot]) -> Optional[Bot]:
+        ttl = self.ttl if bot is not None else self.negative_ttl
+        self.entries[token] = (bot, time.monotonic() + ttl)
+        self.entries.move_to_end(token)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return bot
+
+    def get(self, db_url: str, token: str) -> Optional[Bot]:
+        """Active bot with the given token, None if there is none"""
+        cached = self.entries.get(token)
+        if cached is not None:
+            bot, expires_at = cached
+            if time.monotonic() < expires_at:
+                self.entries.move_to_end(token)
+                self.stats['hits' if bot is not None else 'negative_hits'] += 1
+                return bot
+
+        with get_connection(db_url) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if cached is not None and cached[0] is not None:
+                bot = cached[0]
+                cur.execute(
+                    "SELECT config_version FROM bots WHERE id = %s AND is_active = %s",
+                    (bot['id'], True)
+                )
+                current = cur.fetchone()
+                if current is not None and current['config_version'] == bot['config_version']:
+                    self.stats['revalidated'] += 1
+                    return self._store(token, bot)
+
+            cur.execute(
+                f"SELECT {BOT_COLUMNS} FROM bots WHERE telegram_token = %s AND is_active = %s LIMIT 1",
+                (token, True)
+            )
+            row = cur.fetchone()
+
+        self.stats['misses'] += 1
+        return self._store(token, dict(row) if row is not None else None)
+
+    def invalidate(self, token: str) -> None:
+        self.entries.pop(token, None)
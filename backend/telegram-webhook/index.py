@@ -1,36 +1,40 @@
 """
 Business: Telegram webhook handler with AI integration - receives messages and sends intelligent auto-replies
-Args: event - dict with httpMethod, body (Telegram update)
+Args: event - dict with httpMethod, body (Telegram update), or a timer trigger event to run the queue worker;
+             the bot is routed by its webhook secret (X-Telegram-Bot-Api-Secret-Token header, path or ?secret=),
+             TELEGRAM_BOT_TOKEN still serves a single bot when no secret is sent
       context - object with attributes: request_id, function_name
 Returns: HTTP response dict
+Env: ML_CHAT_MODE=inprocess (default) answers from the training data in this function,
+     ML_CHAT_MODE=remote calls the ml-chat function at ML_CHAT_URL instead;
+     WEBHOOK_MODE=async stores updates in webhook_queue and answers Telegram at once;
+     the timer-triggered worker then generates and sends the replies
 """
 
 import json
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import urllib.request
-import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from bot_cache import BotCache
+from routes import RoutingTable, extract_secret
+from shared.fast_json import dumps
+from shared.matcher import answer_message
+from shared.pg_pool import get_connection
+from shared.telegram_client import TelegramError, get_client
+from worker import Job, PostgresQueue, drain
+
+ML_CHAT_URL = os.environ.get('ML_CHAT_URL', 'https://functions.poehali.dev/23f5dcaf-616d-4957-922d-ef9968ec1662')
+
+_bots = BotCache()
+_routes = RoutingTable()
+
 
 def send_telegram_message(bot_token: str, chat_id: str, text: str) -> bool:
-    telegram_url = f'https://api.telegram.org/bot{bot_token}/sendMessage'
-    data = json.dumps({
-        'chat_id': chat_id,
-        'text': text,
-        'parse_mode': 'HTML'
-    }).encode('utf-8')
-    
-    req = urllib.request.Request(
-        telegram_url,
-        data=data,
-        headers={'Content-Type': 'application/json'}
-    )
-    
     try:
-        with urllib.request.urlopen(req) as response:
-            return True
-    except Exception:
+        return bool(get_client().send_message(bot_token, chat_id, text, parse_mode='HTML').get('ok'))
+    except TelegramError:
         return False
 
 
@@ -56,6 +60,22 @@ def call_ml_chat(bot_id: int, message: str, ml_chat_url: str) -> Optional[str]:
         return None
 
 
+def fetch_rows(db_url: str, query: str, params: tuple) -> List[Dict[str, Any]]:
+    with get_connection(db_url) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(query, params)
+        return cur.fetchall()
+
+
+def ask_ml_chat(db_url: str, bot_id: int, message: str) -> Optional[str]:
+    """Answer from the training data, in process or through the ml-chat function"""
+    if os.environ.get('ML_CHAT_MODE', 'inprocess') == 'remote':
+        return call_ml_chat(bot_id, message, ML_CHAT_URL)
+    try:
+        return answer_message(lambda query, params: fetch_rows(db_url, query, params), bot_id, message)['content']
+    except Exception:
+        return None
+
+
 def get_fallback_response(message_text: str) -> str:
     """Fallback responses if AI is not configured"""
     message_lower = message_text.lower().strip()
@@ -81,7 +101,178 @@ def get_fallback_response(message_text: str) -> str:
     return 'Я вас понял. Ваш запрос передан специалисту. Мы свяжемся с вами в ближайшее время!'
 
 
+def parse_update(update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Fields of an incoming text message, None for other update types"""
+    if 'message' not in update:
+        return None
+    
+    message = update['message']
+    return {
+        'chat_id': str(message['chat']['id']),
+        'text': message.get('text', ''),
+        'user_id': message['from']['id'],
+        'username': message['from'].get('username', '')
+    }
+
+
+def generate_reply(db_url: str, bot_id: int, message_text: str) -> str:
+    response_text = ask_ml_chat(db_url, bot_id, message_text)
+    if not response_text:
+        response_text = get_fallback_response(message_text)
+    return response_text
+
+
+def record_reply(cur, message_id: int, bot_id: int, response_text: str) -> None:
+    """
+    Store the reply on its message row and count it in daily analytics;
+    a message that already has its reply is not counted again
+    """
+    cur.execute(
+        """
+        WITH answered AS (
+            UPDATE messages SET response_text = %s WHERE id = %s AND response_text IS NULL
+            RETURNING id
+        )
+        INSERT INTO bot_analytics (bot_id, date, messages_count, unique_users_count) 
+        SELECT %s, CURRENT_DATE, 1, 1 FROM answered
+        ON CONFLICT (bot_id, date) 
+        DO UPDATE SET messages_count = bot_analytics.messages_count + 1
+        """,
+        (response_text, message_id, bot_id)
+    )
+
+
+def save_reply(db_url: str, message_id: int, bot_id: int, response_text: str) -> None:
+    with get_connection(db_url) as conn, conn.cursor() as cur:
+        record_reply(cur, message_id, bot_id, response_text)
+        conn.commit()
+
+
+def reply_now(db_url: str, bot_token: str, bot_id: int, incoming: Dict[str, Any]) -> None:
+    """
+    Synchronous path: store, generate, send and record within the webhook call.
+    No pooled connection is held while the reply is generated and sent.
+    """
+    with get_connection(db_url) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "INSERT INTO messages (bot_id, user_id, username, message_text) VALUES (%s, %s, %s, %s) RETURNING id",
+            (bot_id, incoming['user_id'], incoming['username'], incoming['text'])
+        )
+        message_id = cur.fetchone()['id']
+        conn.commit()
+    
+    response_text = generate_reply(db_url, bot_id, incoming['text'])
+    
+    if send_telegram_message(bot_token, incoming['chat_id'], response_text):
+        save_reply(db_url, message_id, bot_id, response_text)
+
+
+def resolve_bot(db_url: str, event: Dict[str, Any]) -> Optional[Tuple[int, str]]:
+    """
+    (bot_id, token) of the bot an update is addressed to: by webhook secret,
+    or by the TELEGRAM_BOT_TOKEN of a legacy single-bot deployment
+    """
+    secret = extract_secret(event)
+    if secret:
+        route = _routes.resolve(db_url, secret)
+        return (route['id'], route['telegram_token']) if route else None
+    
+    legacy_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+    if legacy_token:
+        bot = _bots.get(db_url, legacy_token)
+        return (bot['id'], legacy_token) if bot else None
+    return None
+
+
+def token_for_bot(db_url: str, bot_id: int) -> Optional[str]:
+    """
+    Token to reply as bot_id. The legacy TELEGRAM_BOT_TOKEN is used only if
+    it belongs to that same active bot, never to answer for another bot
+    """
+    route = _routes.bot(db_url, bot_id)
+    if route:
+        return route['telegram_token']
+    
+    legacy_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+    if legacy_token:
+        bot = _bots.get(db_url, legacy_token)
+        if bot and bot['id'] == bot_id:
+            return legacy_token
+    return None
+
+
+def store_message(db_url: str, job: Job) -> int:
+    """Store the job's incoming message and link it to the job, so a retry reuses it"""
+    incoming = job['payload']
+    with get_connection(db_url) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            """
+            WITH stored AS (
+                INSERT INTO messages (bot_id, user_id, username, message_text) VALUES (%s, %s, %s, %s)
+                RETURNING id
+            )
+            UPDATE webhook_queue SET message_id = (SELECT id FROM stored) WHERE id = %s
+            RETURNING message_id
+            """,
+            (job['bot_id'], incoming['user_id'], incoming['username'], incoming['text'], job['id'])
+        )
+        message_id = cur.fetchone()['message_id']
+        conn.commit()
+    job['message_id'] = message_id
+    return message_id
+
+
+def process_job(db_url: str, job: Job, queue: Any) -> None:
+    """
+    Worker path for one queued update. The message row is stored once per job,
+    so a retried job reuses it; a failed send raises and the job is retried.
+    Once Telegram has accepted the reply the job is marked sent, and a retry
+    after that only records the reply.
+    """
+    bot_id = job['bot_id']
+    if job.get('sent_at'):
+        save_reply(db_url, job['message_id'], bot_id, job['response_text'])
+        return
+    
+    incoming = job['payload']
+    bot_token = token_for_bot(db_url, bot_id)
+    if not bot_token:
+        raise RuntimeError(f'No active bot {bot_id}')
+    
+    message_id = job.get('message_id') or store_message(db_url, job)
+    response_text = generate_reply(db_url, bot_id, incoming['text'])
+    
+    if not send_telegram_message(bot_token, incoming['chat_id'], response_text):
+        raise RuntimeError('Telegram sendMessage failed')
+    
+    queue.mark_sent(job, response_text)
+    save_reply(db_url, message_id, bot_id, response_text)
+
+
+def is_worker_trigger(event: Dict[str, Any]) -> bool:
+    """Timer trigger invocations carry messages and no HTTP method"""
+    return 'httpMethod' not in event and 'messages' in event
+
+
+def ok_response(extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json'},
+        'isBase64Encoded': False,
+        'body': dumps({'ok': True, **(extra or {})})
+    }
+
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    db_url = os.environ.get('DATABASE_URL')
+    
+    if is_worker_trigger(event):
+        if not db_url:
+            return ok_response()
+        queue = PostgresQueue(db_url)
+        stats = drain(queue, lambda job: process_job(db_url, job, queue))
+        return ok_response({'worker': stats})
+    
     method: str = event.get('httpMethod', 'POST')
     
     if method == 'OPTIONS':
@@ -90,114 +281,37 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Telegram-Bot-Api-Secret-Token',
                 'Access-Control-Max-Age': '86400'
             },
             'body': ''
         }
     
     if method != 'POST':
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json'},
-            'isBase64Encoded': False,
-            'body': json.dumps({'ok': True})
-        }
+        return ok_response()
     
     try:
         update = json.loads(event.get('body', '{}'))
+        incoming = parse_update(update)
         
-        if 'message' not in update:
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json'},
-                'isBase64Encoded': False,
-                'body': json.dumps({'ok': True})
-            }
-        
-        message = update['message']
-        chat_id = str(message['chat']['id'])
-        message_text = message.get('text', '')
-        user_id = message['from']['id']
-        username = message['from'].get('username', '')
-        
-        db_url = os.environ.get('DATABASE_URL')
-        bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
-        
-        if not bot_token or not db_url:
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json'},
-                'isBase64Encoded': False,
-                'body': json.dumps({'ok': True})
-            }
-        
-        conn = psycopg2.connect(db_url)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute(
-            "SELECT * FROM bots WHERE telegram_token = %s AND is_active = %s LIMIT 1",
-            (bot_token, True)
-        )
-        bot = cur.fetchone()
+        if incoming is None or not db_url:
+            return ok_response()
         
+        bot = resolve_bot(db_url, event)
         if not bot:
-            cur.close()
-            conn.close()
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json'},
-                'isBase64Encoded': False,
-                'body': json.dumps({'ok': True})
-            }
-        
-        bot_id = bot['id']
-        
-        cur.execute(
-            "INSERT INTO messages (bot_id, user_id, username, message_text) VALUES (%s, %s, %s, %s)",
-            (bot_id, user_id, username, message_text)
-        )
-        conn.commit()
-        
-        ml_chat_url = 'https://functions.poehali.dev/23f5dcaf-616d-4957-922d-ef9968ec1662'
-        response_text = call_ml_chat(bot_id, message_text, ml_chat_url)
+            return ok_response()
+        bot_id, bot_token = bot
         
-        if not response_text:
-            response_text = get_fallback_response(message_text)
+        if os.environ.get('WEBHOOK_MODE', 'sync') == 'async':
+            update_id = update.get('update_id')
+            if not isinstance(update_id, int):
+                # Jobs are keyed by (bot_id, update_id); without an id the update cannot be deduplicated
+                return ok_response({'skipped': 'update_id missing'})
+            PostgresQueue(db_url).enqueue(bot_id, update_id, incoming)
+        else:
+            reply_now(db_url, bot_token, bot_id, incoming)
         
-        send_success = send_telegram_message(bot_token, chat_id, response_text)
-        
-        if send_success:
-            cur.execute(
-                "UPDATE messages SET response_text = %s WHERE bot_id = %s AND user_id = %s AND message_text = %s",
-                (response_text, bot_id, user_id, message_text)
-            )
-            
-            cur.execute(
-                """
-                INSERT INTO bot_analytics (bot_id, date, messages_count, unique_users_count) 
-                VALUES (%s, CURRENT_DATE, 1, 1)
-                ON CONFLICT (bot_id, date) 
-                DO UPDATE SET messages_count = bot_analytics.messages_count + 1
-                """,
-                (bot_id,)
-            )
-            conn.commit()
-        
-        cur.close()
-        conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json'},
-            'isBase64Encoded': False,
-            'body': json.dumps({'ok': True})
-        }
+        return ok_response()
         
     except Exception as e:
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json'},
-            'isBase64Encoded': False,
-            'body': json.dumps({'ok': True, 'error': str(e)})
-        }
\ No newline at end of file
+        return ok_response({'error': str(e)})
@@ -0,0 +1,82 @@
+"""
+Routing table of the shared webhook deployment: webhook secret -> bot.
+All active bots are loaded with one narrow query and kept in dicts, so
+routing an update is a dictionary lookup. The table is reloaded every
+ROUTES_REFRESH_SECONDS, and sooner (at most every ROUTES_MISS_REFRESH_SECONDS)
+when a secret or bot is not found, so new bots are picked up quickly.
+"""
+
+import os
+import time
+from typing import Any, Dict, Optional
+
+from psycopg2.extras import RealDictCursor
+
+from shared.pg_pool import get_connection
+
+ROUTES_REFRESH_SECONDS = float(os.environ.get('ROUTES_REFRESH_SECONDS', '30'))
+ROUTES_MISS_REFRESH_SECONDS = float(os.environ.get('ROUTES_MISS_REFRESH_SECONDS', '5'))
+
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+
+Route = Dict[str, Any]
+
+
+def extract_secret(event: Dict[str, Any]) -> Optional[str]:
+    """Secret from the X-Telegram-Bot-Api-Secret-Token header, the path or ?secret="""
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == SECRET_HEADER and value:
+            return value
+    secret = (event.get('pathParams') or {}).get('secret')
+    if secret:
+        return secret
+    return (event.get('queryStringParameters') or {}).get('secret') or None
+
+
+class RoutingTable:
+    def __init__(
+        self,
+        refresh_seconds: float = ROUTES_REFRESH_SECONDS,
+        miss_refresh_seconds: float = ROUTES_MISS_REFRESH_SECONDS
+    ) -> None:
+        self.refresh_seconds = refresh_seconds
+        self.miss_refresh_seconds = miss_refresh_seconds
+        self.by_secret: Dict[str, Route] = {}
+        self.by_bot_id: Dict[int, Route] = {}
+        self.loaded_at: Optional[float] = None
+        self.stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'refreshes': 0}
+
+    def _age(self) -> float:
+        if self.loaded_at is None:
+            return float('inf')
+        return time.monotonic() - self.loaded_at
+
+    def refresh(self, db_url: str) -> None:
+        with get_connection(db_url) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                "SELECT id, telegram_token, webhook_secret FROM bots WHERE is_active = %s AND webhook_secret IS NOT NULL",
+                (True,)
+            )
+            rows = [dict(row) for row in cur.fetchall()]
+        self.by_secret = {row['webhook_secret']: row for row in rows}
+        self.by_bot_id = {row['id']: row for row in rows}
+        self.loaded_at = time.monotonic()
+        self.stats['refreshes'] += 1
+
+    def _lookup(self, db_url: str, table_name: str, key: Any) -> Optional[Route]:
+        if self._age() >= self.refresh_seconds:
+            self.refresh(db_url)
+        route = getattr(self, table_name).get(key)
+        if route is None and self._age() >= self.miss_refresh_seconds:
+            self.refresh(db_url)
+            route = getattr(self, table_name).get(key)
+        self.stats['hits' if route is not None else 'misses'] += 1
+        return route
+
+    def resolve(self, db_url: str, secret: str) -> Optional[Route]:
+        """Active bot owning the webhook secret"""
+        return self._lookup(db_url, 'by_secret', secret)
+
+    def bot(self, db_url: str, bot_id: int) -> Optional[Route]:
+        """Active bot by id, for the queue worker"""
+        return self._lookup(db_url, 'by_bot_id', bot_id)
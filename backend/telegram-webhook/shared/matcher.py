@@ -0,0 +1,141 @@
+# Vendored from backend/shared/matcher.py by backend/shared/vendor.py - do not edit
+"""
+Matching engine of ml-chat as a library: loads a bot's training rows into
+the warm TF-IDF cache and answers a message from it.
+Database access goes through a fetch(query, params) -> rows callable, so
+ml-chat runs it over goauth-proxy and telegram-webhook over its own
+psycopg2 pool without an HTTP hop between the functions.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from shared.sparse_index import index_class
+from shared.tfidf_index import TfidfIndex
+from shared.training_cache import CacheEntry, TrainingCache, Version
+
+ANSWER_THRESHOLD = 0.2
+UNKNOWN_ANSWER = "Интересный вопрос! Я ещё учусь и пока не знаю точный ответ. Можете научить меня?"
+
+Fetch = Callable[[str, tuple], List[Dict[str, Any]]]
+
+_cache = TrainingCache()
+
+
+def training_scope(bot_id: Optional[int]) -> Tuple[str, tuple]:
+    """WHERE clause selecting a bot's own rows, or the shared ones without a bot"""
+    if bot_id:
+        return "bot_id = %s", (bot_id,)
+    return "bot_id IS NULL", ()
+
+
+def fetch_version(fetch: Fetch, bot_id: Optional[int]) -> Optional[Version]:
+    """Cheap fingerprint of a bot's training rows: count, max id, max updated_at"""
+    where, params = training_scope(bot_id)
+    rows = fetch(
+        f"SELECT COUNT(*) AS row_count, MAX(id) AS max_id, MAX(updated_at)::text AS updated_at FROM bot_training_data WHERE {where}",
+        params
+    )
+    if not rows:
+        return None
+    return (int(rows[0].get('row_count') or 0), rows[0].get('max_id'), rows[0].get('updated_at'))
+
+
+def append_tail(fetch: Fetch, bot_id: Optional[int], entry: CacheEntry, version: Version) -> bool:
+    """Add rows newer than the cached index if that is all that changed"""
+    index = entry.index
+    if version[0] <= len(index) or type(index) is not index_class(version[0]):
+        return False
+
+    where, params = training_scope(bot_id)
+    tail = fetch(
+        f"SELECT id, question, answer, updated_at::text AS updated_at FROM bot_training_data WHERE {where} AND id > %s ORDER BY id",
+        params + (index.last_row_id or 0,)
+    )
+    newest = max([stamp for stamp in [entry.version[2]] + [row.get('updated_at') for row in tail] if stamp], default=None)
+    if len(index) + len(tail) != version[0] or newest != version[2]:
+        return False
+
+    for row in tail:
+        index.add(row.get('id'), row['question'], row['answer'])
+    entry.version = version
+    return True
+
+
+def load_corpus(fetch: Fetch, bot_id: Optional[int], base: Optional[TfidfIndex]) -> TfidfIndex:
+    """Return the warm index of one corpus, revalidating it against the database"""
+    key = bot_id or None
+    entry = _cache.get(key)
+    if entry is not None and entry.index.base is not base:
+        entry.index.rebase(base)
+        _cache.resize(key)
+    if entry is not None and entry.fresh:
+        _cache.stats['hits'] += 1
+        return entry.index
+
+    version = fetch_version(fetch, bot_id)
+    if entry is not None:
+        if version is None or version == entry.version:
+            _cache.stats['revalidated'] += 1
+            entry.checked_at = time.monotonic()
+            return entry.index
+        if append_tail(fetch, bot_id, entry, version):
+            _cache.stats['appended'] += 1
+            entry.checked_at = time.monotonic()
+            _cache.resize(key)
+            return entry.index
+
+    where, params = training_scope(bot_id)
+    rows = fetch(f"SELECT id, question, answer FROM bot_training_data WHERE {where} ORDER BY id", params)
+    index = index_class(len(rows)).from_rows(rows, base)
+    _cache.stats['misses'] += 1
+    _cache.put(key, index, version or (len(rows), index.last_row_id, None))
+    return index
+
+
+def load_index(fetch: Fetch, bot_id: Optional[int]) -> TfidfIndex:
+    """
+    Shared corpus (bot_id IS NULL) is indexed once per container; a bot
+    gets an overlay of its own rows on top of it
+    """
+    shared = load_corpus(fetch, None, None)
+    if not bot_id:
+        return shared
+    return load_corpus(fetch, bot_id, shared)
+
+
+def remember(bot_id: Optional[int], row: Dict, question: str, answer: str) -> None:
+    """Apply a locally inserted training row to the cache right away"""
+    key = bot_id or None
+    entry = _cache.get(key)
+    if entry is not None:
+        entry.index.add(row.get('id'), question, answer)
+        entry.version = (entry.version[0] + 1, row.get('id'), row.get('updated_at'))
+        _cache.resize(key)
+
+
+def answer_message(fetch: Fetch, bot_id: Optional[int], message: str, top_k: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Best answer to a message from the bot's training data
+
+    Returns:
+        {'content', 'confidence'} and, when top_k is given, ranked 'candidates'
+    """
+    index = load_index(fetch, bot_id)
+    top = index.search(message, k=top_k or 1)
+    matched = bool(top) and top[0][0] >= ANSWER_THRESHOLD
+
+    result: Dict[str, Any] = {
+        'content': index.row(top[0][1])[1] if matched else UNKNOWN_ANSWER,
+        'confidence': 'high' if matched else 'low'
+    }
+    if top_k:
+        result['candidates'] = []
+        for score, doc in top:
+            candidate_question, candidate_answer = index.row(doc)
+            result['candidates'].append({
+                'question': candidate_question,
+                'answer': candidate_answer,
+                'confidence': round(score, 4)
+            })
+    return result
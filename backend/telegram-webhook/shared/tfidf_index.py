@@ -0,0 +1,230 @@
+# Vendored from backend/shared/tfidf_index.py by backend/shared/vendor.py - do not edit
+"""
+Incremental TF-IDF index over bot training questions.
+Kept at module level by shared.matcher so it survives warm invocations.
+"""
+
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+_PUNCT_RE = re.compile(r'[^\w\s]')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, drop punctuation and split into words"""
+    return _PUNCT_RE.sub('', text.lower()).split()
+
+
+def term_frequencies(tokens: List[str]) -> Dict[str, float]:
+    """Relative term frequencies of a token list"""
+    total = len(tokens)
+    if not total:
+        return {}
+    return {word: count / total for word, count in Counter(tokens).items()}
+
+
+class TfidfIndex:
+    """
+    IDF table, L2-normalized document vectors and an inverted index
+    (term -> [(doc, weight)]) over training questions.
+
+    search() only scores documents sharing a term with the query and
+    stops admitting new candidates once the remaining terms' upper
+    bounds cannot reach the current k-th score (max-score pruning).
+
+    Rows added with add() are weighted with the current IDF right away;
+    the whole index is re-weighted once the number of such rows exceeds
+    REFRESH_RATIO of the corpus, so adding stays O(row) amortized.
+
+    An index built with a base (the shared corpus) is an overlay: it
+    stores only its own rows and takes IDF over base and overlay together.
+    The base's stored vectors use the base's own IDF and are shared by all
+    overlays, so search() takes a candidate pool from the base and rescores
+    it under the combined IDF before merging; scores from both corpora are
+    then on one scale. The base counts its changes in generation, and an
+    overlay re-weights its rows before searching if the base changed since.
+    Positions returned by search() count the overlay's rows first, so on
+    equal scores a bot's own answer wins over the shared one.
+    """
+
+    REFRESH_RATIO = 0.1
+    RESCORE_POOL = 4
+    RESCORE_MIN = 20
+
+    def __init__(self, base: Optional['TfidfIndex'] = None) -> None:
+        self.base = base
+        self.row_ids: List[Optional[int]] = []
+        self.questions: List[str] = []
+        self.answers: List[str] = []
+        self.doc_tf: List[Dict[str, float]] = []
+        self.df: Counter = Counter()
+        self.idf: Dict[str, float] = {}
+        self.doc_vectors: List[Dict[str, float]] = []
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        self.max_weight: Dict[str, float] = {}
+        self.generation = 0
+        self.base_generation: Optional[int] = None
+        self._unweighted = 0
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    @property
+    def last_row_id(self) -> Optional[int]:
+        return self.row_ids[-1] if self.row_ids else None
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict], base: Optional['TfidfIndex'] = None) -> 'TfidfIndex':
+        index = cls(base)
+        for row in rows:
+            index._append(row.get('id'), row['question'], row['answer'])
+        index.refresh()
+        return index
+
+    def rebase(self, base: Optional['TfidfIndex']) -> None:
+        """Attach the overlay to a rebuilt shared corpus and re-weight it"""
+        self.base = base
+        self.refresh()
+
+    def row(self, position: int) -> Tuple[str, str]:
+        """(question, answer) at a position returned by search()"""
+        if position >= len(self.row_ids):
+            return self.base.row(position - len(self.row_ids))
+        return self.questions[position], self.answers[position]
+
+    def term_idf(self, word: str) -> float:
+        num_docs, doc_count = len(self.row_ids), self.df.get(word, 0)
+        if self.base is not None:
+            num_docs += len(self.base.row_ids)
+            doc_count += self.base.df.get(word, 0)
+        return math.log((num_docs + 1) / (doc_count + 1))
+
+    def _append(self, row_id: Optional[int], question: str, answer: str) -> Dict[str, float]:
+        tf = term_frequencies(tokenize(question))
+        self.row_ids.append(row_id)
+        self.questions.append(question)
+        self.answers.append(answer)
+        self.doc_tf.append(tf)
+        self.doc_vectors.append({})
+        self.df.update(tf.keys())
+        return tf
+
+    def _index_doc(self, doc: int, tf: Dict[str, float]) -> None:
+        weights = {word: freq * self.idf[word] for word, freq in tf.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        if norm == 0:
+            self.doc_vectors[doc] = {}
+            return
+        vector = {word: weight / norm for word, weight in weights.items() if weight}
+        self.doc_vectors[doc] = vector
+        for word, weight in vector.items():
+            self.postings.setdefault(word, []).append((doc, weight))
+            if weight > self.max_weight.get(word, 0.0):
+                self.max_weight[word] = weight
+
+    def refresh(self) -> None:
+        """Recompute IDF for the whole corpus and rebuild the postings"""
+        self.idf = {word: self.term_idf(word) for word in self.df}
+        self.postings = {}
+        self.max_weight = {}
+        for doc, tf in enumerate(self.doc_tf):
+            self._index_doc(doc, tf)
+        self._unweighted = 0
+        self.generation += 1
+        self.base_generation = self.base.generation if self.base is not None else None
+
+    def add(self, row_id: Optional[int], question: str, answer: str) -> None:
+        """Index a single new row without rebuilding the corpus"""
+        tf = self._append(row_id, question, answer)
+        self._unweighted += 1
+        self.generation += 1
+        if self._unweighted > self.REFRESH_RATIO * len(self.row_ids):
+            self.refresh()
+            return
+        for word in tf:
+            self.idf[word] = self.term_idf(word)
+        self._index_doc(len(self.row_ids) - 1, tf)
+
+    def query_vector(self, query: str) -> Dict[str, float]:
+        """Normalized TF-IDF vector of the query under the current IDF"""
+        weights = {word: freq * self.term_idf(word) for word, freq in term_frequencies(tokenize(query)).items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        if norm == 0:
+            return {}
+        return {word: w / norm for word, w in weights.items() if w}
+
+    def search(self, query: str, k: int = 1, threshold: float = 0.0) -> List[Tuple[float, int]]:
+        """Top-k (score, position) pairs with score >= threshold, best first"""
+        if self.base is not None and self.base_generation != self.base.generation:
+            self.refresh()
+        query_vector = self.query_vector(query)
+        top = self.search_vector(query_vector, k, threshold)
+        if self.base is None:
+            return top
+
+        offset = len(self.row_ids)
+        merged = [(score, -doc) for score, doc in top]
+        merged.extend((score, -(doc + offset)) for score, doc in self.rescore_base(query_vector, k, threshold))
+        return [(score, -neg_doc) for score, neg_doc in heapq.nlargest(k, merged)]
+
+    def rescore_base(self, query_vector: Dict[str, float], k: int, threshold: float) -> List[Tuple[float, int]]:
+        """Top-k base rows scored under the combined IDF instead of the base's own"""
+        pool = self.base.search_vector(query_vector, max(k * self.RESCORE_POOL, self.RESCORE_MIN), 0.0)
+        idf: Dict[str, float] = {}
+        scored = []
+        for _, doc in pool:
+            weights = {}
+            for word, freq in self.base.doc_tf[doc].items():
+                if word not in idf:
+                    idf[word] = self.term_idf(word)
+                weights[word] = freq * idf[word]
+            norm = math.sqrt(sum(w * w for w in weights.values()))
+            if norm == 0:
+                continue
+            score = sum(q_weight * weights.get(word, 0.0) for word, q_weight in query_vector.items()) / norm
+            if score > 0 and score >= threshold:
+                scored.append((score, -doc))
+        return [(score, -neg_doc) for score, neg_doc in heapq.nlargest(k, scored)]
+
+    def search_vector(self, query_vector: Dict[str, float], k: int, threshold: float) -> List[Tuple[float, int]]:
+        """Top-k over this index's own rows for an already weighted query"""
+        terms = sorted(
+            (
+                (q_weight * self.max_weight[word], word, q_weight)
+                for word, q_weight in query_vector.items() if word in self.postings
+            ),
+            reverse=True
+        )
+        remaining = sum(bound for bound, _, _ in terms)
+        floor = threshold
+        scores: Dict[int, float] = {}
+
+        for bound, word, q_weight in terms:
+            if remaining < floor:
+                if len(scores) < len(self.postings[word]):
+                    for doc in scores:
+                        scores[doc] += q_weight * self.doc_vectors[doc].get(word, 0.0)
+                else:
+                    for doc, d_weight in self.postings[word]:
+                        if doc in scores:
+                            scores[doc] += q_weight * d_weight
+            else:
+                for doc, d_weight in self.postings[word]:
+                    scores[doc] = scores.get(doc, 0.0) + q_weight * d_weight
+                if len(scores) >= k:
+                    floor = max(floor, heapq.nlargest(k, scores.values())[-1])
+            remaining -= bound
+
+        top = heapq.nlargest(
+            k,
+            ((score, -doc) for doc, score in scores.items() if score > 0 and score >= threshold)
+        )
+        return [(score, -neg_doc) for score, neg_doc in top]
+
+    def best_match(self, query: str) -> Tuple[float, int]:
+        """Cosine score and position of the closest question, (0.0, -1) if none"""
+        top = self.search(query, k=1)
+        return top[0] if top else (0.0, -1)
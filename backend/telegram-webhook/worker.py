@@ -0,0 +1,258 @@
+"""
+Asynchronous reply pipeline for telegram-webhook.
+The webhook only enqueues updates; the worker drains the queue, generates
+and sends replies, retrying failed jobs with exponential backoff.
+Jobs are unique per (bot_id, update_id), so Telegram's webhook retries
+never produce a second job. A job is marked sent as soon as Telegram accepts
+its reply, so a retry after that point only records the reply again and
+never sends it twice. Finished jobs are purged after RETENTION_DAYS, so
+deduplication spans Telegram's redelivery window, not the table's lifetime
+(update_ids restart at random after a week without updates).
+"""
+
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from shared.pg_pool import get_connection
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 5.0
+LEASE_SECONDS = 300
+CLAIM_BATCH = 10
+TIME_BUDGET_SECONDS = 20.0
+# Telegram keeps redelivering an unanswered update for up to 24 hours
+RETENTION_DAYS = 2
+PURGE_BATCH = 1000
+
+Job = Dict[str, Any]
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts: int, base: float = RETRY_BASE_SECONDS) -> float:
+    return base * 2 ** (attempts - 1)
+
+
+class PostgresQueue:
+    """
+    webhook_queue table. Claimed jobs are leased for LEASE_SECONDS, so a job
+    whose worker died becomes due again instead of being lost.
+    """
+
+    def __init__(self, db_url: str) -> None:
+        self.db_url = db_url
+
+    def enqueue(self, bot_id: int, update_id: int, payload: Dict[str, Any]) -> bool:
+        with get_connection(self.db_url) as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO webhook_queue (bot_id, update_id, payload) VALUES (%s, %s, %s)
+                ON CONFLICT (bot_id, update_id) DO NOTHING
+                RETURNING id
+                """,
+                (bot_id, update_id, json.dumps(payload))
+            )
+            created = cur.fetchone() is not None
+            conn.commit()
+        return created
+
+    def claim(self, limit: int) -> List[Job]:
+        with get_connection(self.db_url) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                UPDATE webhook_queue q
+                SET status = 'processing', attempts = q.attempts + 1,
+                    available_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+                WHERE q.id IN (
+                    SELECT id FROM webhook_queue
+                    WHERE status IN ('pending', 'processing') AND available_at <= CURRENT_TIMESTAMP
+                    ORDER BY available_at, id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING q.id, q.bot_id, q.update_id, q.payload, q.attempts, q.message_id, q.sent_at, q.response_text
+                """,
+                (LEASE_SECONDS, limit)
+            )
+            jobs = [dict(row) for row in cur.fetchall()]
+            conn.commit()
+        return sorted(jobs, key=lambda job: job['id'])
+
+    def mark_sent(self, job: Job, response_text: str) -> None:
+        """Remember that the reply reached Telegram, before anything else can fail"""
+        with get_connection(self.db_url) as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE webhook_queue SET sent_at = CURRENT_TIMESTAMP, response_text = %s
+                WHERE id = %s
+                RETURNING sent_at
+                """,
+                (response_text, job['id'])
+            )
+            job['sent_at'] = cur.fetchone()[0]
+            conn.commit()
+        job['response_text'] = response_text
+
+    def complete(self, job: Job) -> None:
+        with get_connection(self.db_url) as conn, conn.cursor() as cur:
+            cur.execute(
+                "UPDATE webhook_queue SET status = 'done', processed_at = CURRENT_TIMESTAMP WHERE id = %s",
+                (job['id'],)
+            )
+            conn.commit()
+
+    def fail(self, job: Job, error: str) -> bool:
+        """Reschedule a failed job; returns False once it ran out of attempts"""
+        retry = job['attempts'] < MAX_ATTEMPTS
+        with get_connection(self.db_url) as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE webhook_queue
+                SET status = %s, last_error = %s, available_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+                WHERE id = %s
+                """,
+                ('pending' if retry else 'failed', error[:1000], retry_delay(job['attempts']), job['id'])
+            )
+            conn.commit()
+        return retry
+
+    def purge(self, retention_days: int = RETENTION_DAYS, limit: int = PURGE_BATCH) -> int:
+        """Delete up to limit done or failed jobs older than retention_days"""
+        with get_connection(self.db_url) as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM webhook_queue
+                WHERE id IN (
+                    SELECT id FROM webhook_queue
+                    WHERE status IN ('done', 'failed') AND created_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+                    ORDER BY created_at
+                    LIMIT %s
+                )
+                """,
+                (retention_days, limit)
+            )
+            purged = cur.rowcount
+            conn.commit()
+        return purged
+
+
+class InMemoryQueue:
+    """Same interface as PostgresQueue, for running the worker in process"""
+
+    def __init__(self, retry_base: float = 0.0) -> None:
+        self.retry_base = retry_base
+        self.jobs: List[Job] = []
+        self._keys: set = set()
+
+    def enqueue(self, bot_id: int, update_id: int, payload: Dict[str, Any]) -> bool:
+        if (bot_id, update_id) in self._keys:
+            return False
+        self._keys.add((bot_id, update_id))
+        self.jobs.append({
+            'id': len(self.jobs) + 1,
+            'bot_id': bot_id,
+            'update_id': update_id,
+            'payload': payload,
+            'attempts': 0,
+            'message_id': None,
+            'sent_at': None,
+            'response_text': None,
+            'status': 'pending',
+            'last_error': None,
+            'available_at': time.monotonic(),
+            'created_at': time.monotonic()
+        })
+        return True
+
+    def claim(self, limit: int) -> List[Job]:
+        now = time.monotonic()
+        due = [job for job in self.jobs if job['status'] in ('pending', 'processing') and job['available_at'] <= now]
+        claimed = due[:limit]
+        for job in claimed:
+            job['status'] = 'processing'
+            job['attempts'] += 1
+            job['available_at'] = now + LEASE_SECONDS
+        return claimed
+
+    def mark_sent(self, job: Job, response_text: str) -> None:
+        job['sent_at'] = time.time()
+        job['response_text'] = response_text
+
+    def complete(self, job: Job) -> None:
+        job['status'] = 'done'
+
+    def fail(self, job: Job, error: str) -> bool:
+        retry = job['attempts'] < MAX_ATTEMPTS
+        job['status'] = 'pending' if retry else 'failed'
+        job['last_error'] = error
+        job['available_at'] = time.monotonic() + retry_delay(job['attempts'], self.retry_base)
+        return retry
+
+    def purge(self, retention_days: int = RETENTION_DAYS, limit: int = PURGE_BATCH) -> int:
+        cutoff = time.monotonic() - retention_days * 86400
+        expired = [
+            job for job in self.jobs if job['status'] in ('done', 'failed') and job['created_at'] < cutoff
+        ][:limit]
+        for job in expired:
+            self.jobs.remove(job)
+            self._keys.discard((job['bot_id'], job['update_id']))
+        return len(expired)
+
+
+def drain(
+    queue: Any,
+    handle: Callable[[Job], None],
+    batch_size: int = CLAIM_BATCH,
+    time_budget: float = TIME_BUDGET_SECONDS
+) -> Dict[str, int]:
+    """
+    Process due jobs until the queue is empty or the time budget is spent.
+    handle() raising marks the job for retry. If the queue itself cannot be
+    updated the error is logged and the job is left to its lease. Each run
+    first purges a batch of expired finished jobs.
+    """
+    stats = {'processed': 0, 'retried': 0, 'failed': 0}
+    deadline = time.monotonic() + time_budget
+    try:
+        queue.purge()
+    except Exception:
+        logger.exception('Could not purge webhook jobs')
+    while time.monotonic() < deadline:
+        jobs = queue.claim(batch_size)
+        if not jobs:
+            break
+        for job in jobs:
+            try:
+                handle(job)
+                error = None
+            except Exception as e:
+                error = str(e)
+            try:
+                if error is None:
+                    queue.complete(job)
+                    stats['processed'] += 1
+                else:
+                    stats['retried' if queue.fail(job, error) else 'failed'] += 1
+            except Exception:
+                logger.exception('Could not update webhook job %s', job['id'])
+    return stats
+
+
+def run_local(
+    updates: Iterable[Tuple[int, int, Dict[str, Any]]],
+    handle: Callable[[Job], None],
+    queue: Optional[InMemoryQueue] = None
+) -> Tuple[InMemoryQueue, Dict[str, int]]:
+    """
+    Enqueue (bot_id, update_id, payload) triples into an in-memory queue and
+    drain it with the given handler, retrying immediately. Lets the pipeline
+    run without Telegram or a database.
+    """
+    queue = queue if queue is not None else InMemoryQueue()
+    for bot_id, update_id, payload in updates:
+        queue.enqueue(bot_id, update_id, payload)
+    return queue, drain(queue, handle)
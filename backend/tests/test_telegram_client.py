@@ -0,0 +1,104 @@
+"""
+shared.telegram_client against a local stub of the Bot API: 429 retry_after
+handling, the max_retries cap, keep-alive reuse and the retry on a kept-alive
+connection the server has closed.
+
+Usage: python -m pytest backend/tests
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+FUNCTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'telegram-webhook')
+sys.path.insert(0, FUNCTION_DIR)
+
+from shared.telegram_client import MAX_RETRY_AFTER, TelegramClient  # noqa: E402
+
+OK = {'ok': True, 'result': {'message_id': 1}}
+
+
+def too_many_requests(retry_after):
+    return {'ok': False, 'error_code': 429, 'description': 'Too Many Requests', 'parameters': {'retry_after': retry_after}}
+
+
+class StubApi(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'StubBotApi'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.paths.append(self.path)
+        status, payload, hang_up = self.server.script.pop(0)
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # Drop the connection without announcing it, as an idle timeout does
+        self.close_connection = hang_up
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubApi)
+    server.daemon_threads = True
+    server.connections = 0
+    server.paths = []
+    server.script = []
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(server, sleeps, **options):
+    return TelegramClient(api_base=f'http://127.0.0.1:{server.server_port}', sleep=sleeps.append, **options)
+
+
+def test_retries_429_then_recovers_from_closed_keep_alive(stub):
+    stub.script = [(429, too_many_requests(3), False), (200, OK, True), (200, OK, False)]
+    sleeps = []
+    client = make_client(stub, sleeps)
+
+    assert client.send_message('123:abc', 42, 'привет') == OK
+    assert sleeps == [3.0]
+    assert stub.connections == 1
+
+    assert client.call('123:abc', 'getMe') == OK
+    assert stub.connections == 2
+    assert stub.paths == ['/bot123:abc/sendMessage'] * 2 + ['/bot123:abc/getMe']
+    assert client.stats == {'requests': 3, 'reused': 2, 'rate_limited': 1, 'errors': 0}
+
+
+def test_gives_up_after_max_retries(stub):
+    stub.script = [(429, too_many_requests(1), False)] * 3
+    sleeps = []
+    client = make_client(stub, sleeps, max_retries=2)
+
+    assert client.call('123:abc', 'sendMessage', {'chat_id': 42, 'text': 'a'}) == too_many_requests(1)
+    assert sleeps == [1.0, 1.0]
+    assert stub.script == []
+    assert stub.connections == 1
+
+
+def test_does_not_wait_out_long_retry_after(stub):
+    stub.script = [(429, too_many_requests(MAX_RETRY_AFTER + 1), False)]
+    sleeps = []
+    client = make_client(stub, sleeps)
+
+    assert client.call('123:abc', 'sendMessage')['error_code'] == 429
+    assert sleeps == []
@@ -0,0 +1,184 @@
+"""
+telegram-webhook queue: in-process pipeline (run_local), the webhook's
+enqueue path and, with TEST_DATABASE_URL set to a database migrated from
+db_migrations, PostgresQueue enqueue/claim/complete against Postgres.
+
+Usage: python -m pytest backend/tests
+"""
+
+import os
+import sys
+
+import pytest
+
+FUNCTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'telegram-webhook')
+sys.path.insert(0, FUNCTION_DIR)
+
+import index  # noqa: E402
+import worker  # noqa: E402
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+UPDATE = {
+    'message': {
+        'message_id': 1,
+        'from': {'id': 42, 'username': 'user'},
+        'chat': {'id': 42, 'type': 'private'},
+        'text': 'Привет'
+    }
+}
+
+
+def test_run_local_dedupes_and_retries():
+    failures = {2: 1, 3: worker.MAX_ATTEMPTS}
+    handled = []
+
+    def handle(job):
+        if failures.get(job['update_id'], 0) > 0:
+            failures[job['update_id']] -= 1
+            raise RuntimeError('send failed')
+        handled.append(job['update_id'])
+
+    updates = [(1, 1, {'text': 'a'}), (1, 1, {'text': 'a again'}), (1, 2, {'text': 'b'}), (1, 3, {'text': 'c'})]
+    queue, stats = worker.run_local(updates, handle)
+
+    assert len(queue.jobs) == 3
+    assert sorted(handled) == [1, 2]
+    assert stats == {'processed': 2, 'retried': worker.MAX_ATTEMPTS, 'failed': 1}
+    assert {job['update_id']: job['status'] for job in queue.jobs} == {1: 'done', 2: 'done', 3: 'failed'}
+
+
+def test_reply_is_sent_once_when_recording_fails(monkeypatch):
+    sent = []
+    recorded = []
+
+    def send(bot_token, chat_id, text):
+        sent.append((chat_id, text))
+        return True
+
+    def store_message(db_url, job):
+        job['message_id'] = 11
+        return 11
+
+    def save_reply(db_url, message_id, bot_id, response_text):
+        if not recorded:
+            recorded.append(None)
+            raise RuntimeError('database went away')
+        recorded.append((message_id, response_text))
+
+    monkeypatch.setattr(index, 'token_for_bot', lambda db_url, bot_id: 'token')
+    monkeypatch.setattr(index, 'store_message', store_message)
+    monkeypatch.setattr(index, 'generate_reply', lambda db_url, bot_id, text: 'Здравствуйте!')
+    monkeypatch.setattr(index, 'send_telegram_message', send)
+    monkeypatch.setattr(index, 'save_reply', save_reply)
+
+    queue = worker.InMemoryQueue()
+    incoming = index.parse_update(UPDATE)
+    _, stats = worker.run_local([(7, 100, incoming)], lambda job: index.process_job('unused', job, queue), queue)
+
+    assert sent == [('42', 'Здравствуйте!')]
+    assert recorded == [None, (11, 'Здравствуйте!')]
+    assert stats == {'processed': 1, 'retried': 1, 'failed': 0}
+
+
+def test_drain_survives_queue_errors(caplog):
+    class BrokenQueue(worker.InMemoryQueue):
+        def complete(self, job):
+            raise RuntimeError('connection reset')
+
+    queue = BrokenQueue()
+    _, stats = worker.run_local([(1, 1, {'text': 'a'}), (1, 2, {'text': 'b'})], lambda job: None, queue)
+
+    assert stats == {'processed': 0, 'retried': 0, 'failed': 0}
+    assert [job['status'] for job in queue.jobs] == ['processing', 'processing']
+    assert 'Could not update webhook job' in caplog.text
+
+
+def test_purge_ends_dedup_window_of_finished_jobs():
+    queue, _ = worker.run_local([(1, 1, {'text': 'a'}), (1, 2, {'text': 'b'})], lambda job: None)
+    queue.jobs[0]['created_at'] -= worker.RETENTION_DAYS * 86400 + 1
+
+    assert queue.purge() == 1
+    assert [job['update_id'] for job in queue.jobs] == [2]
+    assert queue.enqueue(1, 1, {'text': 'a week later'}) is True
+    assert queue.enqueue(1, 2, {'text': 'b again'}) is False
+
+
+class RecordingQueue:
+    enqueued = []
+
+    def __init__(self, db_url):
+        pass
+
+    def enqueue(self, bot_id, update_id, payload):
+        self.enqueued.append((bot_id, update_id))
+        return True
+
+
+@pytest.fixture
+def async_webhook(monkeypatch):
+    RecordingQueue.enqueued = []
+    monkeypatch.setenv('WEBHOOK_MODE', 'async')
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://unused')
+    monkeypatch.setattr(index, 'resolve_bot', lambda db_url, event: (7, 'token'))
+    monkeypatch.setattr(index, 'PostgresQueue', RecordingQueue)
+    return RecordingQueue.enqueued
+
+
+def test_webhook_enqueues_by_update_id(async_webhook):
+    response = index.handler({'httpMethod': 'POST', 'body': index.dumps({'update_id': 100, **UPDATE})}, None)
+    assert response['statusCode'] == 200
+    assert async_webhook == [(7, 100)]
+
+
+def test_webhook_skips_update_without_id(async_webhook):
+    for _ in range(2):
+        response = index.handler({'httpMethod': 'POST', 'body': index.dumps(UPDATE)}, None)
+        assert response['statusCode'] == 200
+        assert 'update_id missing' in response['body']
+    assert async_webhook == []
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+def test_postgres_queue_enqueue_claim_complete():
+    import psycopg2
+
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO bots (name, telegram_token) VALUES ('queue test', %s) RETURNING id", (f'queue-test-{os.getpid()}',))
+        bot_id = cur.fetchone()[0]
+    conn.commit()
+
+    queue = worker.PostgresQueue(TEST_DATABASE_URL)
+    try:
+        assert queue.enqueue(bot_id, 1, {'text': 'a'}) is True
+        assert queue.enqueue(bot_id, 1, {'text': 'a again'}) is False
+        assert queue.enqueue(bot_id, 2, {'text': 'b'}) is True
+
+        jobs = [job for job in queue.claim(10) if job['bot_id'] == bot_id]
+        assert [(job['update_id'], job['attempts']) for job in jobs] == [(1, 1), (2, 1)]
+        assert [job for job in queue.claim(10) if job['bot_id'] == bot_id] == []
+
+        queue.mark_sent(jobs[0], 'reply')
+        assert jobs[0]['sent_at'] is not None
+        queue.complete(jobs[0])
+        assert queue.fail(jobs[1], 'send failed') is True
+        with conn.cursor() as cur:
+            cur.execute("SELECT update_id, status FROM webhook_queue WHERE bot_id = %s ORDER BY update_id", (bot_id,))
+            assert cur.fetchall() == [(1, 'done'), (2, 'pending')]
+            cur.execute(
+                "UPDATE webhook_queue SET created_at = created_at - make_interval(days => %s) WHERE bot_id = %s",
+                (worker.RETENTION_DAYS + 1, bot_id)
+            )
+        conn.commit()
+
+        queue.purge()
+        with conn.cursor() as cur:
+            cur.execute("SELECT update_id FROM webhook_queue WHERE bot_id = %s", (bot_id,))
+            assert cur.fetchall() == [(2,)]
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM webhook_queue WHERE bot_id = %s", (bot_id,))
+            cur.execute("DELETE FROM bots WHERE id = %s", (bot_id,))
+        conn.commit()
+        conn.close()
@@ -0,0 +1,6 @@
+-- Existence check for auto-learning: (bot_id, question) lookups without a scan.
+-- md5 keeps index entries small for long questions.
+CREATE INDEX IF NOT EXISTS idx_training_bot_question ON bot_training_data(bot_id, md5(question));
+
+-- Lookback window scan of a bot's conversation history
+CREATE INDEX IF NOT EXISTS idx_messages_bot_created_at ON messages(bot_id, created_at);
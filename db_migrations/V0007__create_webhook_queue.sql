@@ -0,0 +1,18 @@
+-- Durable queue of Telegram updates for asynchronous reply generation
+CREATE TABLE IF NOT EXISTS webhook_queue (
+    id BIGSERIAL PRIMARY KEY,
+    bot_id INTEGER REFERENCES bots(id),
+    update_id BIGINT NOT NULL,
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    message_id INTEGER REFERENCES messages(id),
+    last_error TEXT,
+    available_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP,
+    UNIQUE(bot_id, update_id)
+);
+
+-- Workers claim due jobs in id order
+CREATE INDEX IF NOT EXISTS idx_webhook_queue_due ON webhook_queue(available_at, id) WHERE status IN ('pending', 'processing');
@@ -0,0 +1,2 @@
+-- Bumped by bots-api on every update so warm caches of bot config can revalidate by primary key
+ALTER TABLE bots ADD COLUMN IF NOT EXISTS config_version INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1,7 @@
+-- Per-bot secret routing Telegram updates to their bot in the shared webhook deployment.
+-- Telegram accepts 1-256 characters A-Z, a-z, 0-9, _ and - as secret_token; md5 hex fits.
+ALTER TABLE bots ADD COLUMN IF NOT EXISTS webhook_secret VARCHAR(64);
+
+UPDATE bots SET webhook_secret = md5(random()::text || id::text || clock_timestamp()::text) WHERE webhook_secret IS NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_bots_webhook_secret ON bots(webhook_secret);
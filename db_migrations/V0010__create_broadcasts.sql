@@ -0,0 +1,25 @@
+-- Bulk sends from telegram-bot; recipients double as the resume checkpoint
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id SERIAL PRIMARY KEY,
+    bot_id INTEGER REFERENCES bots(id),
+    message_text TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'in_progress',
+    total INTEGER NOT NULL DEFAULT 0,
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    blocked INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS broadcast_recipients (
+    broadcast_id INTEGER NOT NULL REFERENCES broadcasts(id),
+    chat_id BIGINT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    error TEXT,
+    PRIMARY KEY (broadcast_id, chat_id)
+);
+
+-- Next chunk of a broadcast: pending recipients in chat_id order
+CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_pending ON broadcast_recipients(broadcast_id, chat_id) WHERE status = 'pending';
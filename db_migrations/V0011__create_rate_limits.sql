@@ -0,0 +1,8 @@
+-- Shared GCRA state: theoretical arrival time (epoch seconds) of the next request per key
+CREATE TABLE IF NOT EXISTS rate_limits (
+    key VARCHAR(255) PRIMARY KEY,
+    tat DOUBLE PRECISION NOT NULL
+);
+
+-- Periodic cleanup of keys idle for an hour
+CREATE INDEX IF NOT EXISTS idx_rate_limits_tat ON rate_limits(tat);
@@ -0,0 +1,8 @@
+-- Keyset pagination of the bot list by (created_at, id); a NULL created_at would fall out of the keyset
+UPDATE bots SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL;
+ALTER TABLE bots ALTER COLUMN created_at SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_bots_created_at_id ON bots(created_at DESC, id DESC);
+
+-- Same order within the is_active filter used by the dashboard
+CREATE INDEX IF NOT EXISTS idx_bots_active_created_at_id ON bots(is_active, created_at DESC, id DESC);
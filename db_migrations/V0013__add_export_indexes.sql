@@ -0,0 +1,4 @@
+-- Export of a bot's rows in id order (bots-api action=export): the
+-- (bot_id, id) range is read straight from the index, without a sort
+CREATE INDEX IF NOT EXISTS idx_training_bot_id_id ON bot_training_data(bot_id, id);
+CREATE INDEX IF NOT EXISTS idx_messages_bot_id_id ON messages(bot_id, id);
@@ -0,0 +1,6 @@
+-- A call claims a chunk of recipients ('sending') for a lease before it
+-- sends, so two calls resuming the same broadcast never share recipients;
+-- a chunk left by a crashed call becomes claimable again when the lease ends
+ALTER TABLE broadcast_recipients ADD COLUMN IF NOT EXISTS lease_until TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_claimable ON broadcast_recipients(broadcast_id, chat_id) WHERE status IN ('pending', 'sending');
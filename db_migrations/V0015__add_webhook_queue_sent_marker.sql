@@ -0,0 +1,3 @@
+-- Set once Telegram accepted a job's reply, so a retried job never sends it again
+ALTER TABLE webhook_queue ADD COLUMN IF NOT EXISTS sent_at TIMESTAMP;
+ALTER TABLE webhook_queue ADD COLUMN IF NOT EXISTS response_text TEXT;
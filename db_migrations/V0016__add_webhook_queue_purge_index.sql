@@ -0,0 +1,2 @@
+-- The worker deletes finished jobs after the retention period, oldest first
+CREATE INDEX IF NOT EXISTS idx_webhook_queue_finished ON webhook_queue(created_at) WHERE status IN ('done', 'failed');
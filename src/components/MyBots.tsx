@@ -22,6 +22,36 @@ interface MyBot {
   daysLeft?: number;
 }
 
+interface ApiBot {
+  id: number;
+  name: string;
+  description: string | null;
+  is_active: boolean;
+  ai_model: string | null;
+}
+
+const BOTS_API_URL = 'https://functions.poehali.dev/96b3f1ab-3e6d-476d-9886-020600efada2';
+const BOTS_PAGE_SIZE = 200;
+
+const fetchAllBots = async (): Promise<ApiBot[]> => {
+  const bots: ApiBot[] = [];
+  let cursor: string | null = null;
+  do {
+    const params = new URLSearchParams({ limit: String(BOTS_PAGE_SIZE) });
+    if (cursor) {
+      params.set('cursor', cursor);
+    }
+    const response = await fetch(`${BOTS_API_URL}?${params}`);
+    if (!response.ok) {
+      throw new Error(`Bots API error: ${response.status}`);
+    }
+    const data = await response.json();
+    bots.push(...(data.bots ?? []));
+    cursor = data.next_cursor ?? null;
+  } while (cursor);
+  return bots;
+};
+
 const mockMyBots: MyBot[] = [
   {
     id: 1,
@@ -82,8 +112,7 @@ const MyBots = () => {
   const loadBots = async () => {
     setLoading(true);
     try {
-      const response = await fetch('https://functions.poehali.dev/96b3f1ab-3e6d-476d-9886-020600efada2');
-      const data = await response.json();
+      const apiBots = await fetchAllBots();
       
       const activatedBots: MyBot[] = activeBots.map(activeBot => {
         const templateBot = mockBots.find(b => b.id === activeBot.botId);
@@ -104,22 +133,18 @@ const MyBots = () => {
         };
       });
       
-      if (data.bots) {
-        const mappedBots: MyBot[] = data.bots.map((bot: any) => ({
-          id: bot.id,
-          name: bot.name,
-          type: bot.bot_type,
-          platform: bot.platform,
-          status: bot.status as 'active' | 'paused' | 'draft',
-          users: Math.floor(Math.random() * 500),
-          messages: Math.floor(Math.random() * 2000),
-          lastActive: bot.status === 'draft' ? 'Никогда' : '1 час назад',
-          performance: bot.status === 'draft' ? 0 : Math.floor(Math.random() * 40) + 60
-        }));
-        setBots([...activatedBots, ...mappedBots]);
-      } else {
-        setBots(activatedBots);
-      }
+      const mappedBots: MyBot[] = apiBots.map(bot => ({
+        id: bot.id,
+        name: bot.name,
+        type: bot.ai_model ? 'ИИ-агент' : 'Чат-бот',
+        platform: 'Telegram',
+        status: bot.is_active ? 'active' : 'paused',
+        users: Math.floor(Math.random() * 500),
+        messages: Math.floor(Math.random() * 2000),
+        lastActive: '1 час назад',
+        performance: Math.floor(Math.random() * 40) + 60
+      }));
+      setBots([...activatedBots, ...mappedBots]);
     } catch (error) {
       const activatedBots: MyBot[] = activeBots.map(activeBot => {
         const templateBot = mockBots.find(b => b.id === activeBot.botId);